@@ -0,0 +1,51 @@
+"""Compares the compression profiles of util.encode.
+
+Run from the repository root:
+
+    python -m benchmarks.compression [blueprint files...]
+
+Defaults to the blueprint strings bundled with the tests. Reports the
+compression ratio and the encode throughput, in MB of json per second,
+of every profile.
+"""
+import glob
+import sys
+import timeit
+
+from py_factorio_blueprints import util
+
+
+def benchmark(strings, number=20):
+    """ Returns {profile: (ratio, MB/s)} for encoding all strings """
+    data = [util.decode(string) for string in strings]
+    dumps = util._get_json_backend()[1]
+    json_size = sum(len(dumps(obj)) for obj in data)
+    results = {}
+    for profile in util.COMPRESSION_PROFILES:
+        compressed_size = sum(
+            len(util._compress(dumps(obj), profile)) for obj in data)
+        seconds = min(timeit.repeat(
+            lambda: [util.encode(obj, compression=profile) for obj in data],
+            number=1, repeat=number))
+        results[profile] = (
+            json_size / compressed_size, json_size / seconds / 1e6)
+    return results
+
+
+def main(filenames):
+    if not filenames:
+        filenames = sorted(glob.glob('tests/blueprint_strings/*.blueprint'))
+    strings = []
+    for filename in filenames:
+        with open(filename) as f:
+            strings.append(f.read().strip())
+
+    print(f"{len(strings)} blueprint strings, "
+          f"{sum(map(len, strings))} characters")
+    print(f"{'profile':<10}{'ratio':>10}{'MB/s':>10}")
+    for profile, (ratio, throughput) in benchmark(strings).items():
+        print(f"{profile:<10}{ratio:>10.2f}{throughput:>10.2f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,50 @@
+"""Compares the json backends available to util.encode and util.decode.
+
+Run from the repository root:
+
+    python -m benchmarks.json_backends [blueprint files...]
+
+Defaults to the blueprint strings bundled with the tests.
+"""
+import glob
+import sys
+import timeit
+
+from py_factorio_blueprints import util
+
+
+def benchmark(strings, number=20):
+    """ Returns {backend: (decode seconds, encode seconds)}, the time
+    taken to decode and encode all strings once, best of number runs """
+    data = [util.decode(string, json_backend='json') for string in strings]
+    results = {}
+    for backend in util.json_backends():
+        decode = min(timeit.repeat(
+            lambda: [util.decode(string, json_backend=backend)
+                     for string in strings],
+            number=1, repeat=number))
+        encode = min(timeit.repeat(
+            lambda: [util.encode(obj, json_backend=backend)
+                     for obj in data],
+            number=1, repeat=number))
+        results[backend] = decode, encode
+    return results
+
+
+def main(filenames):
+    if not filenames:
+        filenames = sorted(glob.glob('tests/blueprint_strings/*.blueprint'))
+    strings = []
+    for filename in filenames:
+        with open(filename) as f:
+            strings.append(f.read().strip())
+
+    print(f"{len(strings)} blueprint strings, "
+          f"{sum(map(len, strings))} characters")
+    print(f"{'backend':<10}{'decode (ms)':>14}{'encode (ms)':>14}")
+    for backend, (decode, encode) in benchmark(strings).items():
+        print(f"{backend:<10}{decode * 1000:>14.3f}{encode * 1000:>14.3f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
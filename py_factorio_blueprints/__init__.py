@@ -1,3 +1,4 @@
 from .blueprint import Blueprint, BaseEntity
+from .book import Book
 
 name = "py_factorio_blueprints"
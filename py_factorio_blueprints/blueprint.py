@@ -1,6 +1,10 @@
+import hashlib
 import logging
-from py_factorio_blueprints import util
-from py_factorio_blueprints.entity import Entity as BaseEntity
+import math
+from py_factorio_blueprints import util, prototype_data
+from py_factorio_blueprints.columns import EntityColumns
+from py_factorio_blueprints.entity import \
+    Entity as BaseEntity, _rotation_kind, _flips
 from py_factorio_blueprints.exceptions import *
 from py_factorio_blueprints.util import (
     Color, Tile, Connection, Vector, obj_set, Direction
@@ -33,36 +37,141 @@ class Schedule:
         }
 
 
+class ConnectionSet:
+    """ Set of the circuit connections of a blueprint. A connection and
+    its flipped counterpart are the same member. """
+    def __init__(self, connections=()):
+        self.__connections = {}
+        # Maps every entity to the connections attached to it.
+        self.__by_entity = {}
+        # Bumped on every change, like BlueprintLayer._revision.
+        self._revision = 0
+        for connection in connections:
+            self.add(connection)
+
+    def __iter__(self):
+        yield from list(self.__connections)
+
+    def __len__(self):
+        return len(self.__connections)
+
+    def __contains__(self, connection):
+        return connection in self.__connections
+
+    def add(self, connection):
+        if connection in self.__connections:
+            return
+        self.__connections[connection] = None
+        self._revision += 1
+        for entity in (connection.from_entity, connection.to_entity):
+            if entity is not None:
+                self.__by_entity.setdefault(entity, {})[connection] = None
+
+    def remove(self, connection):
+        del self.__connections[connection]
+        self._revision += 1
+        for entity in (connection.from_entity, connection.to_entity):
+            attached = self.__by_entity.get(entity)
+            if attached is None:
+                continue
+            attached.pop(connection, None)
+            if not attached:
+                del self.__by_entity[entity]
+
+    def discard(self, connection):
+        if connection in self.__connections:
+            self.remove(connection)
+
+    def of(self, entity):
+        """ Returns the connections attached to the given entity """
+        return list(self.__by_entity.get(entity, ()))
+
+    def remove_entity(self, entity):
+        """ Removes all connections attached to the given entity """
+        for connection in self.of(entity):
+            self.discard(connection)
+
+
 class BlueprintLayer:
+    # Edge length of the square cells used by the spatial index.
+    CELL_SIZE = 8
+
     def __set_name__(self, owner, name):
         self.name = name
         self.owner = owner
 
-    def __init__(self, blueprint, obj_type, strict=True):
+    def __init__(self, blueprint, obj_type, strict=True, columnar=False):
         self.__blueprint = blueprint
         self.strict = strict
         self.obj_type = obj_type
         self.objs = []
+        self.__members = set()
+        # Maps the imported ids (obj_type.ID) to their objects. Ids can be
+        # shared, so every id maps to a dict used as an ordered set.
+        self.__ids = {}
+        # Set when the order of objs, and with it the auto entity
+        # numbers, no longer matches the objects positions.
+        self.__dirty = False
+        # Bumped on every change to the layer, lets others cache values
+        # derived from its contents.
+        self._revision = 0
+        # Spatial hash, built on the first area query and kept up to date
+        # afterwards. Maps a cell to the objects overlapping it.
+        self.__cells = None
+        self.__obj_cells = None
+        self.__columns = None
+        if columnar:
+            self.use_columns()
 
     def __iter__(self):
-        yield from self.objs
+        self._refresh()
+        yield from list(self.objs)
 
-    def __getitem__(self, vector):
-        if type(vector) is tuple:
-            vector = Vector(vector)
+    def __len__(self):
+        return len(self.objs)
 
-        return [obj for obj in self.objs
-                if obj.collides(vector)]
+    def __getitem__(self, vector):
+        return self.at(vector)
 
     def __delitem__(self, obj):
         if isinstance(obj, self.obj_type):
-            self.objs.remove(obj)
-            obj._blueprint_layer = None
+            self.remove(obj)
         else:
-            objs = self[obj]
-            for obj in objs:
-                self.objs.remove(obj)
-                obj._blueprint_layer = None
+            for obj in self[obj]:
+                self.remove(obj)
+
+    def at(self, point):
+        """ Returns the objects that collide with the given point """
+        if type(point) is tuple:
+            point = Vector(point)
+        cells = self.__index()
+        candidates = cells.get(self.__cell(point.x, point.y), ())
+        return sorted(
+            (obj for obj in candidates if obj.collides(point)),
+            key=self.__sort_key)
+
+    def in_area(self, top_left, bottom_right):
+        """ Returns the objects that overlap the given area """
+        if type(top_left) is tuple:
+            top_left = Vector(top_left)
+        if type(bottom_right) is tuple:
+            bottom_right = Vector(bottom_right)
+        cells = self.__index()
+        min_x, min_y = self.__cell(top_left.x, top_left.y)
+        max_x, max_y = self.__cell(bottom_right.x, bottom_right.y)
+        found = {}
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                for obj in cells.get((cx, cy), ()):
+                    if obj in found:
+                        continue
+                    obj_top_left, obj_bottom_right = self.__bounds(obj)
+                    if top_left.x < obj_bottom_right.x and \
+                            obj_top_left.x < bottom_right.x and \
+                            top_left.y < obj_bottom_right.y and \
+                            obj_top_left.y < bottom_right.y:
+                        found[obj] = None
+        return sorted(found, key=self.__sort_key)
 
     def add(self, obj):
         if not isinstance(obj, self.obj_type):
@@ -71,18 +180,32 @@ class BlueprintLayer:
         if obj._blueprint_layer is not None and obj._blueprint_layer != self:
             raise DuplicateEntity(
                 "Can't add Entity instance to more than one BlueprintLayer")
-        if obj in self.objs:
+        if obj in self.__members:
             return
         self.objs.append(obj)
+        self.__members.add(obj)
         obj._blueprint_layer = self
-        self.sort()
+        if self.__columns is not None:
+            self.__columns.attach(obj)
+        self.__register_id(obj)
+        self.__index_add(obj)
+        self.__dirty = True
+        self._revision += 1
 
     def remove(self, obj):
         if not isinstance(obj, self.obj_type):
             raise TypeError(
                 f"{obj} is not of type {self.obj_type}")
         self.objs.remove(obj)
+        self.__members.discard(obj)
+        self.blueprint.connections.remove_entity(obj)
+        self.__unregister_id(obj)
+        self.__index_remove(obj)
         obj._blueprint_layer = None
+        if self.__columns is not None:
+            obj.position, obj.direction = self.__columns.detach(obj)
+        self.__dirty = True
+        self._revision += 1
 
     def make(self, *args, **kwargs):
         obj = self.obj_type(*args, blueprint_layer=self, **kwargs)
@@ -92,19 +215,209 @@ class BlueprintLayer:
     def sort(self):
         self.__sort()
         self.__reindex()
+        self.__dirty = False
+
+    def _refresh(self):
+        """ Sorts and renumbers the objects if anything changed since the
+        last time they were numbered """
+        if self.__dirty:
+            self.sort()
 
     def _load(self, *args, **kwargs):
         obj = self.obj_type(*args, blueprint_layer=self, **kwargs)
         self.objs.append(obj)
+        self.__members.add(obj)
+        if self.__columns is not None:
+            self.__columns.attach(obj)
+        self.__register_id(obj)
+        self.__index_add(obj)
+        self.__dirty = True
+        self._revision += 1
+
+    def _update(self, obj):
+        """ Called by objects of this layer whenever their footprint
+        changes """
+        if obj not in self.__members:
+            return
+        self.__dirty = True
+        self._revision += 1
+        if self.__columns is not None:
+            self.__columns.set_name(obj._row, obj.name)
+        if self.__obj_cells is not None:
+            self.__index_remove(obj)
+            self.__index_add(obj)
 
     @property
     def blueprint(self):
         return self.__blueprint
 
-    def rotate(self, amount, **kwargs):
+    @property
+    def columns(self):
+        """ The EntityColumns holding the positions, directions and names
+        of the objects, or None """
+        return self.__columns
+
+    def use_columns(self, enabled=True):
+        """ Moves the positions, directions and names of the objects into
+        EntityColumns, so whole layer transforms and bounds are computed
+        as array operations. Needs numpy, and objects with a direction
+        (entities). enabled=False moves them back onto the objects. """
+        if enabled == (self.__columns is not None):
+            return
+        if not enabled:
+            columns, self.__columns = self.__columns, None
+            self.__cells = self.__obj_cells = None
+            # From the last row back, so no rows have to be moved.
+            for obj in reversed(list(columns.objs)):
+                obj.position, obj.direction = columns.detach(obj)
+            return
+        if not hasattr(self.obj_type, '_columns'):
+            raise TypeError(
+                f"{self.obj_type} can't be stored in columns")
+        columns = EntityColumns()
+        for obj in self.objs:
+            columns.attach(obj)
+        self.__columns = columns
+
+    def rotate(self, amount, around=(0, 0),
+               direction=Direction.CLOCKWISE):
+        """ Turns every object amount quarter turns around a point, as one
+        transform of the whole layer. The objects are sorted again when
+        they are next needed in order. """
+        amount = util._quarter_turns(amount, direction)
+        center = Vector(around)
+        # Every footprint changes, rebuild the index on the next query
+        # instead of updating it once per object.
+        self.__cells = self.__obj_cells = None
+        if self.__columns is not None:
+            self.__rotate_columns(amount, center)
+        else:
+            self.__rotate_objs(amount, center)
+        self.__dirty = True
+        self._revision += 1
+
+    def __rotate_objs(self, amount, center):
+        # Swapped and negated rather than multiplied by a matrix, so ints
+        # stay ints, like Vector.rotate() keeps them.
+        # Tiles are positioned by a corner, see Tile._CORNERS.
+        dx, dy = self.obj_type._CORNERS[amount]
+        cx, cy = center.x + dx, center.y + dy
+        vector = util._vector
         for obj in self.objs:
-            obj.rotate(amount, **kwargs)
-        self.sort()
+            position = obj.position
+            x, y = position.x - center.x, position.y - center.y
+            if amount == 1:
+                x, y = -y, x
+            elif amount == 2:
+                x, y = -x, -y
+            elif amount == 3:
+                x, y = y, -x
+            obj._turn(vector(x + cx, y + cy), amount)
+
+    def __rotate_columns(self, amount, center):
+        columns = self.__columns
+        columns.rotate_positions(amount, (center.x, center.y))
+        turned = []
+        for obj in columns.objs:
+            kind = _rotation_kind(type(obj))
+            if kind == 'direction':
+                turned.append(obj._row)
+            elif kind is not None:
+                obj._rotate_mixins(amount)
+        columns.rotate_directions(amount, turned)
+
+    def flip(self, axis, around=(0, 0)):
+        """ Mirrors every object across the line through around, as one
+        transform of the whole layer. 'horizontal' swaps left and right,
+        'vertical' swaps up and down. """
+        util._flip_axis(axis)
+        center = Vector(around)
+        self.__cells = self.__obj_cells = None
+        if self.__columns is not None:
+            self.__columns.flip_positions(axis, (center.x, center.y))
+            for obj in self.__columns.objs:
+                if _flips(type(obj)):
+                    super(self.obj_type, obj).flip(axis)
+        else:
+            cx, cy = center.x, center.y
+            # A tile moves to the corner across the flipped axis, the
+            # same as half a turn does along that axis.
+            dx, dy = self.obj_type._CORNERS[2]
+            vector = util._vector
+            horizontal = axis == util.FLIP_HORIZONTAL
+            for obj in self.objs:
+                x, y = obj.position
+                if horizontal:
+                    x = cx - (x - cx) + dx
+                else:
+                    y = cy - (y - cy) + dy
+                obj._mirror(vector(x, y), axis)
+        self.__dirty = True
+        self._revision += 1
+
+    def translate(self, offset):
+        """ Moves every object by offset """
+        offset = Vector(offset)
+        self.__cells = self.__obj_cells = None
+        if self.__columns is not None:
+            self.__columns.translate(offset.x, offset.y)
+        else:
+            dx, dy = offset.x, offset.y
+            vector = util._vector
+            for obj in self.objs:
+                position = obj.position
+                obj._move(vector(position.x + dx, position.y + dy))
+        # Moving everything by the same offset keeps the order, so the
+        # objects don't have to be sorted and numbered again.
+        self._revision += 1
+
+    def _stamp(self, objs, offsets):
+        """ Adds a copy of every one of objs moved by each of offsets, in
+        one batch. objs may belong to any layer of the same type. Returns
+        a list of copies for every offset, in the order of objs. """
+        templates = [self.__template(obj) for obj in objs]
+        # Cheaper to rebuild on the next query than to update per copy.
+        self.__cells = self.__obj_cells = None
+        obj_type = self.obj_type
+        vector, copy_json = util._vector, util._copy_json
+        copies = []
+        for offset in offsets:
+            dx, dy = offset
+            batch = []
+            for x, y, kwargs, nested in templates:
+                if nested:
+                    kwargs = dict(kwargs)
+                    for key, value in nested.items():
+                        kwargs[key] = copy_json(value)
+                batch.append(obj_type(
+                    position=vector(x + dx, y + dy), blueprint_layer=self,
+                    **kwargs))
+            self.objs.extend(batch)
+            self.__members.update(batch)
+            if self.__columns is not None:
+                for obj in batch:
+                    self.__columns.attach(obj)
+            copies.append(batch)
+        # Numbered once, on the next read.
+        self.__dirty = True
+        self._revision += 1
+        return copies
+
+    @staticmethod
+    def __template(obj):
+        """ Returns the position of obj and the keyword arguments that
+        make a copy of it, with the nested values split off. Those have
+        to be copied for every copy, the others can be shared. """
+        kwargs = obj.to_json()
+        for key in ('entity_number', 'connections', 'position'):
+            kwargs.pop(key, None)
+        nested = {
+            key: value for key, value in kwargs.items()
+            if isinstance(value, (dict, list))}
+        for key in nested:
+            del kwargs[key]
+        position = obj.position
+        return position.x, position.y, kwargs, nested
 
     def to_json(self):
         obj = [
@@ -116,23 +429,111 @@ class BlueprintLayer:
         return obj
 
     def get_by_id(self, obj_id):
-        if not hasattr(self.obj_type, 'ID'):
+        """ Returns the object with the given imported id, the first one
+        in order if several have it """
+        objs = self.__ids.get(obj_id)
+        if not objs:
             return None
-        for obj in self.objs:
-            if getattr(obj, self.obj_type.ID) == obj_id:
-                return obj
+        if len(objs) == 1:
+            return next(iter(objs))
+        self._refresh()
+        return min(objs, key=lambda obj: obj._auto_entity_number)
+
+    def get_by_auto_id(self, obj_id):
+        """ Returns the object with the given auto entity number """
+        self._refresh()
+        if 0 < obj_id <= len(self.objs):
+            return self.objs[obj_id - 1]
         return None
 
     def __get__(self, instance, owner):
         return self
 
+    @staticmethod
+    def __sort_key(obj):
+        return obj.position.y, obj.position.x
+
     def __sort(self):
-        self.objs.sort(key=lambda obj: (obj.position.y, obj.position.x))
+        if self.__columns is not None:
+            self.objs[:] = self.__columns.sorted(self.objs)
+        else:
+            self.objs.sort(key=self.__sort_key)
 
     def __reindex(self):
         for i, obj in enumerate(self.objs):
             obj._auto_entity_number = i + 1
 
+    def _id_changed(self, obj, old_id):
+        """ Called by objects of this layer when their imported id
+        changes """
+        if obj not in self.__members:
+            return
+        self.__discard_id(old_id, obj)
+        self.__register_id(obj)
+
+    def __register_id(self, obj):
+        if not hasattr(self.obj_type, 'ID'):
+            return
+        obj_id = getattr(obj, self.obj_type.ID)
+        if obj_id is not None:
+            self.__ids.setdefault(obj_id, {})[obj] = None
+
+    def __unregister_id(self, obj):
+        if not hasattr(self.obj_type, 'ID'):
+            return
+        self.__discard_id(getattr(obj, self.obj_type.ID), obj)
+
+    def __discard_id(self, obj_id, obj):
+        objs = self.__ids.get(obj_id)
+        if objs is not None:
+            objs.pop(obj, None)
+            if not objs:
+                del self.__ids[obj_id]
+
+    @staticmethod
+    def __bounds(obj):
+        try:
+            return obj.top_left, obj.bottom_right
+        except KeyError:
+            # Unknown prototype in non-strict mode, there is no
+            # selection box to go by.
+            return obj.position, obj.position
+
+    def __cell(self, x, y):
+        return (math.floor(x / self.CELL_SIZE),
+                math.floor(y / self.CELL_SIZE))
+
+    def __index(self):
+        if self.__cells is None:
+            self.__cells = {}
+            self.__obj_cells = {}
+            for obj in self.objs:
+                self.__index_add(obj)
+        return self.__cells
+
+    def __index_add(self, obj):
+        if self.__cells is None:
+            return
+        top_left, bottom_right = self.__bounds(obj)
+        min_x, min_y = self.__cell(top_left.x, top_left.y)
+        max_x, max_y = self.__cell(bottom_right.x, bottom_right.y)
+        cells = [
+            (cx, cy)
+            for cx in range(min_x, max_x + 1)
+            for cy in range(min_y, max_y + 1)]
+        for cell in cells:
+            self.__cells.setdefault(cell, {})[obj] = None
+        self.__obj_cells[obj] = cells
+
+    def __index_remove(self, obj):
+        if self.__cells is None:
+            return
+        for cell in self.__obj_cells.pop(obj, ()):
+            objs = self.__cells[cell]
+            del objs[obj]
+            if not objs:
+                del self.__cells[cell]
+
 
 class Blueprint:
     entity_prototypes = {}
@@ -140,12 +541,18 @@ class Blueprint:
     item_prototypes = {}
     signal_prototypes = {}
     tile_prototypes = {}
+    # (name, direction) -> (top_left, bottom_right) lookup tables, filled
+    # once per key from entity_prototypes.
+    _selection_boxes = {}
+    _collision_boxes = {}
 
     @classmethod
     def set_entity_prototype_data(cls, data, append=False):
         if append:
             data = {**cls.entity_prototypes, **data}
         cls.entity_prototypes = data
+        cls._selection_boxes = {}
+        cls._collision_boxes = {}
 
     @classmethod
     def set_recipe_prototype_data(cls, data, append=False):
@@ -172,30 +579,83 @@ class Blueprint:
         cls.tile_prototypes = data
 
     @classmethod
-    def import_prototype_data(cls, filename, **kwargs):
-        with open(filename) as f:
-            data = json.load(f)
-            cls.set_entity_prototype_data(data['entity'], **kwargs)
-            cls.set_recipe_prototype_data(data['recipe'], **kwargs)
-            cls.set_item_prototype_data(data['item'], **kwargs)
-            cls.set_signal_prototype_data(data['signal'], **kwargs)
-            cls.set_tile_prototype_data(data['tile'], **kwargs)
+    def import_prototype_data(cls, filename, cache=True, **kwargs):
+        data = prototype_data.load(filename, cache=cache)
+        cls.set_entity_prototype_data(data['entity'], **kwargs)
+        cls.set_recipe_prototype_data(data['recipe'], **kwargs)
+        cls.set_item_prototype_data(data['item'], **kwargs)
+        cls.set_signal_prototype_data(data['signal'], **kwargs)
+        cls.set_tile_prototype_data(data['tile'], **kwargs)
+
+    @classmethod
+    def get_selection_box(cls, name, direction=0):
+        """ Returns the selection box of an entity prototype facing the
+        given direction, relative to the entity position """
+        top_left, bottom_right = cls._selection_box(name, direction)
+        return top_left.xy, bottom_right.xy
+
+    @classmethod
+    def get_collision_box(cls, name, direction=0):
+        """ Returns the collision box of an entity prototype facing the
+        given direction, falling back to the selection box for prototypes
+        without one """
+        top_left, bottom_right = cls._collision_box(name, direction)
+        return top_left.xy, bottom_right.xy
+
+    @classmethod
+    def _selection_box(cls, name, direction=0):
+        """ get_selection_box() without the copy, the returned vectors are
+        shared and must not be modified or handed out """
+        try:
+            return cls._selection_boxes[name, direction]
+        except KeyError:
+            box = cls.__box(name, direction, 'selection_box')
+            cls._selection_boxes[name, direction] = box
+            return box
+
+    @classmethod
+    def _collision_box(cls, name, direction=0):
+        """ get_collision_box() without the copy, see _selection_box() """
+        try:
+            return cls._collision_boxes[name, direction]
+        except KeyError:
+            if 'collision_box' in cls.entity_prototypes[name]:
+                box = cls.__box(name, direction, 'collision_box')
+            else:
+                box = cls._selection_box(name, direction)
+            cls._collision_boxes[name, direction] = box
+            return box
+
+    @classmethod
+    def __box(cls, name, direction, key):
+        box = cls.entity_prototypes[name][key]
+        top_left = Vector(**box['left_top'])
+        bottom_right = Vector(**box['right_bottom'])
+        if (direction // 2) % 2:
+            top_left, bottom_right = top_left.yx, bottom_right.yx
+        return top_left, bottom_right
 
     def __init__(self, string=None, data=None,
                  *, custom_entity_prototypes=None, strict=True,
-                 verbose=False, **kwargs):
+                 verbose=False, json_backend=None, columnar=False,
+                 **kwargs):
+        """ columnar keeps the entity positions in EntityColumns, see
+        BlueprintLayer.use_columns() """
         super().__init__(**kwargs)
         self._verbose = verbose
         self.strict = strict
-        self.__entities = BlueprintLayer(self, BaseEntity, strict=strict)
+        self.__entities = BlueprintLayer(
+            self, BaseEntity, strict=strict, columnar=columnar)
         self.__tiles = BlueprintLayer(self, Tile, strict=strict)
         self.item = 'blueprint'
         self.label = ''
         self.label_color = None
         self.icons = []
         self.version = 0
-        self.connections = []
+        self.connections = ConnectionSet()
         self.schedules = []
+        self.__maximum_values = None
+        self.__tiles_content = None
 
         if custom_entity_prototypes is None:
             custom_entity_prototypes = {}
@@ -203,15 +663,150 @@ class Blueprint:
 
         logger.debug(string)
         if string is not None:
-            data = util.decode(string)
+            data = util.decode(string, json_backend=json_backend)
             logger.debug(data)
         if data is not None:
             self.load(data)
 
+    @classmethod
+    def from_strings(cls, strings, workers=None, chunksize=16,
+                     json_backend=None, **kwargs):
+        """ Builds a Blueprint from every exchange string in strings. The
+        strings are decoded by util.decode_many over a pool of worker
+        processes, the Blueprints are built in this one. Strings that
+        can't be decoded give an InvalidExchangeString in their place. """
+        return [
+            data if isinstance(data, InvalidExchangeString)
+            else cls(data=data, **kwargs)
+            for data in util.decode_many(
+                strings, workers=workers, chunksize=chunksize,
+                json_backend=json_backend)]
+
     def __eq__(self, other):
         if not isinstance(other, Blueprint):
             return NotImplemented
-        return self.to_string() == other.to_string()
+        if self is other:
+            return True
+        if self.__sizes() != other.__sizes():
+            return False
+        return self.content_hash() == other.content_hash()
+
+    def __hash__(self):
+        return int(self.content_hash()[:16], 16)
+
+    def __sizes(self):
+        return len(self.entities), len(self.tiles), len(self.connections)
+
+    def content_hash(self):
+        """ Returns a sha256 hex digest of the contents of the blueprint.
+        It does not depend on the order the entities were added in, their
+        entity numbers or the order of their connections, so blueprints
+        that are built the same have the same hash.
+
+        The settings of entities can be changed in place, so their part
+        is built anew on every call. The part for the tiles is cached
+        until a tile is added, removed, moved or renamed. """
+        entities, numbers = self._canonical_entities()
+        header = self.__canonical_header(numbers)
+        return hashlib.sha256(
+            util._canonical_dumps([entities, header]) +
+            self.__tiles_digest()).hexdigest()
+
+    def __tiles_digest(self):
+        revision = self.tiles._revision
+        if self.__tiles_content is None or \
+                self.__tiles_content[0] != revision:
+            digest = hashlib.sha256(
+                util._canonical_dumps(self._canonical_tiles())).digest()
+            self.__tiles_content = (revision, digest)
+        return self.__tiles_content[1]
+
+    def __canonical_header(self, numbers):
+        header = {
+            'item': self.item,
+        }
+        obj_set(header, 'label', self.label)
+        obj_set(header, 'label_color', self.label_color)
+        header.update(self.__icons_and_version())
+        header = util._normalize_json(header)
+        schedules = self._canonical_schedules(numbers)
+        if schedules:
+            header['schedules'] = schedules
+        return header
+
+    def __canonical_json(self):
+        entities, numbers = self._canonical_entities()
+        obj = self.__canonical_header(numbers)
+        if entities:
+            obj['entities'] = entities
+        tiles = self._canonical_tiles()
+        if tiles:
+            obj['tiles'] = tiles
+        return {'blueprint': obj}
+
+    def _canonical_entities(self):
+        """ Returns the json of the entities ordered by position, then by
+        their json, and numbered in that order. Also returns the number
+        given to every entity. """
+        entities = []
+        for entity in self.entities:
+            obj = util._normalize_json(entity.to_json())
+            del obj['entity_number']
+            # Rebuilt from the ConnectionSet below, how a connection is
+            # written out by the entity depends on its orientation.
+            obj.pop('connections', None)
+            position = obj['position']
+            entities.append((
+                (position['y'], position['x'], util._canonical_dumps(obj)),
+                obj, entity))
+        entities.sort(key=lambda item: item[0])
+        numbers = {
+            entity: number
+            for number, (_, _, entity) in enumerate(entities, 1)}
+
+        wires = {}
+        for connection in self.connections:
+            ends = (
+                (connection.from_entity, connection.from_side),
+                (connection.to_entity, connection.to_side))
+            for (entity, side), (other, other_side) in (ends, ends[::-1]):
+                if entity not in numbers or other not in numbers:
+                    continue
+                wire = {'entity_id': numbers[other]}
+                if other.NR_CONNECTIONS == 2:
+                    wire['circuit_id'] = other_side
+                colors = wires.setdefault(entity, {}).setdefault(
+                    str(side), {})
+                colors.setdefault(connection.color, []).append(wire)
+
+        result = []
+        for _, obj, entity in entities:
+            obj['entity_number'] = numbers[entity]
+            if entity in wires:
+                for colors in wires[entity].values():
+                    for wire_list in colors.values():
+                        wire_list.sort(key=lambda wire: (
+                            wire['entity_id'], wire.get('circuit_id', 0)))
+                obj['connections'] = wires[entity]
+            result.append(obj)
+        return result, numbers
+
+    def _canonical_tiles(self):
+        tiles = [util._normalize_json(tile.to_json()) for tile in self.tiles]
+        tiles.sort(key=lambda tile: (
+            tile['position']['y'], tile['position']['x'], tile['name']))
+        return tiles
+
+    def _canonical_schedules(self, numbers):
+        schedules = []
+        for schedule in self.schedules:
+            obj = util._normalize_json(schedule.to_json())
+            obj['locomotives'] = sorted(
+                numbers[loco] for loco in schedule.locomotives
+                if loco in numbers)
+            schedules.append(obj)
+        schedules.sort(key=util._canonical_dumps)
+        return schedules
 
     @property
     def entities(self):
@@ -267,11 +862,115 @@ class Blueprint:
         elif color is not None:
             self.label_color = Color(**color)
 
-    def rotate(self, amount, **kwargs):
-        self.entities.rotate(amount, **kwargs)
-        self.tiles.rotate(amount, **kwargs)
+    def rotate(self, amount, around=(0, 0),
+               direction=Direction.CLOCKWISE):
+        self.entities.rotate(amount, around=around, direction=direction)
+        self.tiles.rotate(amount, around=around, direction=direction)
+
+    def translate(self, offset):
+        """ Moves all entities and tiles by offset, as one transform of
+        each layer """
+        offset = Vector(offset)
+        self.entities.translate(offset)
+        self.tiles.translate(offset)
+
+    def flip(self, axis, around=(0, 0)):
+        """ Mirrors the blueprint across the horizontal or vertical line
+        through around. axis is 'horizontal' to swap left and right, or
+        'vertical' to swap up and down. Directions, rail pieces, train
+        orientations, splitter priorities and inserter positions are
+        mirrored along. """
+        self.entities.flip(axis, around=around)
+        self.tiles.flip(axis, around=around)
+
+    def stamp(self, other, offsets):
+        """ Adds a copy of the entities, tiles, circuit connections and
+        train schedules of other for every offset, in one batch. other may
+        be this blueprint, it is copied as it was before the call.
+        Entities are numbered once afterwards, rather than after every
+        copy. """
+        offsets = [Vector(offset) for offset in offsets]
+        entities = list(other.entities)
+        tiles = list(other.tiles)
+        numbers = {entity: i for i, entity in enumerate(entities)}
+        connections = [
+            (numbers[connection.from_entity], numbers[connection.to_entity],
+             connection.from_side, connection.to_side, connection.color)
+            for connection in other.connections
+            if connection.from_entity in numbers and
+            connection.to_entity in numbers]
+        schedules = [
+            ([numbers[loco] for loco in schedule.locomotives
+              if loco in numbers],
+             schedule.schedule)
+            for schedule in other.schedules]
+
+        copies = self.entities._stamp(entities, offsets)
+        self.tiles._stamp(tiles, offsets)
+        for batch in copies:
+            for i, j, from_side, to_side, color in connections:
+                self.connections.add(Connection(
+                    batch[i], batch[j], from_side, to_side, color=color))
+            for locomotives, schedule in schedules:
+                new = Schedule(self, schedule=util._copy_json(schedule),
+                               locomotives=[])
+                new.locomotives = [batch[i] for i in locomotives]
+                self.schedules.append(new)
+
+    def tile_repeat(self, nx, ny, spacing=None):
+        """ Repeats the blueprint nx times to the right and ny times down,
+        the original being the top left copy. spacing is the distance
+        between copies, a number or an (x, y) pair, and defaults to the
+        size of the blueprint in whole tiles. """
+        nx, ny = int(nx), int(ny)
+        if nx < 1 or ny < 1:
+            raise ValueError(f"Can't repeat a blueprint {nx}x{ny} times")
+        if spacing is None:
+            spacing = self.__tile_size()
+        elif isinstance(spacing, (int, float)):
+            spacing = Vector(spacing, spacing)
+        else:
+            spacing = Vector(spacing)
+        self.stamp(self, [
+            (i * spacing.x, j * spacing.y)
+            for j in range(ny) for i in range(nx)
+            if i or j])
+
+    def __tile_size(self):
+        """ The size of the tiles covered by the entities and tiles, for
+        copies of the blueprint that never overlap """
+        boxes = [(entity.top_left, entity.bottom_right)
+                 for entity in self.entities.objs]
+        # A tile covers the square right and down of its position.
+        boxes.extend((tile.position, tile.position + 1)
+                     for tile in self.tiles.objs)
+        if not boxes:
+            raise ValueError(
+                "spacing is needed for an empty blueprint")
+        # Every tile a box reaches into counts, maximum_values truncates
+        # the edges instead.
+        minx = min(math.floor(top_left.x) for top_left, _ in boxes)
+        miny = min(math.floor(top_left.y) for top_left, _ in boxes)
+        maxx = max(math.ceil(bottom_right.x) for _, bottom_right in boxes)
+        maxy = max(math.ceil(bottom_right.y) for _, bottom_right in boxes)
+        return Vector(maxx - minx, maxy - miny)
+
+    def __icons_and_version(self):
+        return {
+            'icons': [
+                {'index': i + 1, 'signal': icon.name.to_json()}
+                for i, icon in enumerate(self.icons)
+                if icon is not None],
+            'version': self.version,
+        }
 
-    def to_json(self):
+    def to_json(self, canonical=False):
+        """ With canonical set, the json only depends on the contents of
+        the blueprint, see content_hash(). Serialized with sorted keys,
+        like to_string(canonical=True) does, equal blueprints give equal
+        strings. """
+        if canonical:
+            return self.__canonical_json()
         obj = {
             'item': self.item,
         }
@@ -279,11 +978,7 @@ class Blueprint:
         obj_set(obj, 'label_color', self.label_color)
         obj_set(obj, 'entities', self.entities.to_json())
         obj_set(obj, 'tiles', self.tiles.to_json())
-        obj['icons'] = [
-            {'index': i + 1, 'signal': icon.name.to_json()}
-            for i, icon in enumerate(self.icons)
-            if icon is not None]
-        obj['version'] = self.version
+        obj.update(self.__icons_and_version())
         schedules = [
             schedule.to_json()
             for schedule in self.schedules]
@@ -295,20 +990,42 @@ class Blueprint:
     def to_json_string(self):
         return json.dumps(self.to_json())
 
-    def to_string(self):
+    def to_string(self, json_backend=None, compression=None,
+                  canonical=False):
+        """ canonical gives the same string for every blueprint with the
+        same contents. It is always serialized by the json module, as the
+        output of the backends is only the same without sorted keys, so
+        it can't be combined with json_backend. """
+        if canonical:
+            if json_backend is not None:
+                raise ValueError(
+                    "json_backend can't be used with canonical=True")
+            return util._encode_json_0(
+                util._canonical_dumps(self.to_json(canonical=True)),
+                compression)
         obj = self.to_json()
-        return util.encode(obj)
+        return util.encode(
+            obj, json_backend=json_backend, compression=compression)
 
     def get_entity_by_id(self, entity_number):
-        for entity in self.entities:
-            if entity.entity_number == entity_number:
-                return entity
+        return self.entities.get_by_id(entity_number)
 
     @property
     def maximum_values(self):
+        revision = self.entities._revision
+        if self.__maximum_values is None or \
+                self.__maximum_values[0] != revision:
+            self.__maximum_values = (
+                revision, self.__compute_maximum_values())
+        return self.__maximum_values[1]
+
+    def __compute_maximum_values(self):
+        columns = self.entities.columns
+        if columns is not None:
+            return columns.bounds(self._selection_box)
         maxx, minx, maxy, miny =\
             float('-inf'), float('inf'), float('-inf'), float('inf')
-        for entity in self.entities:
+        for entity in self.entities.objs:
             top_left, bottom_right = entity.top_left, entity.bottom_right
             _maxx, _minx, _maxy, _miny =\
                 bottom_right.x, top_left.x, bottom_right.y, top_left.y
@@ -363,18 +1080,18 @@ class Blueprint:
             Vector(minx, maxy), Vector(maxx, maxy))
 
     def recenter(self, around=None):
+        """ Moves the blueprint so around, by default its center, ends up
+        at the origin """
         if around is not None:
-            center = around
+            center = Vector(around)
         else:
             center = self.center.ceil()
         if center == Vector(0, 0):
             return
-        for entity in self.entities:
-            entity.position -= center
-        self.replace_entities()
+        self.translate(center * -1)
 
     def parse_connections(self):
-        self.connections = []
+        self.connections = ConnectionSet()
         for entity in self.entities:
             if entity.raw_connections is not None:
                 for side, connection_point in \
@@ -389,8 +1106,6 @@ class Blueprint:
                                 side,
                                 connection.get('circuit_id', '1'),
                                 color=color)
-                            if conn not in self.connections:
-                                self.connections.append(conn)
+                            self.connections.add(conn)
         logger.debug(len(self.connections))
-        for entity in self.entities:
-            connections = entity.get_connections()
+
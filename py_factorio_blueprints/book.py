@@ -1,10 +1,428 @@
+import hashlib
+import json
+import logging
+import os
+from py_factorio_blueprints import util
+from py_factorio_blueprints.blueprint import Blueprint
+from py_factorio_blueprints.exceptions import InvalidExchangeString
+from py_factorio_blueprints.util import Color, obj_set
+
+
+logger = logging.getLogger('py_factorio_blueprints.book')
+
+INDEX_SUFFIX = '.index'
+
+# Bump whenever the layout of the index files changes.
+_INDEX_FORMAT = 1
+
+
+def index_filename(filename):
+    return f"{filename}{INDEX_SUFFIX}"
+
+
+class BookEntry:
+    """ A single entry of a blueprint book. The entry is kept as the json
+    it was loaded from until its blueprint is first asked for.
+
+    raw is the serialized json of the entry, if known. As long as the
+    entry is not dirty it is written out as is, rather than serialized
+    again. """
+    def __init__(self, data, blueprint_kwargs=None, raw=None):
+        self.index = data.get('index')
+        self.item = next(key for key in data if key != 'index')
+        self.__data = data
+        self.__raw_json = raw
+        self.__raw_index = self.index
+        self.__dirty = False
+        self.__blueprint = None
+        self.__blueprint_kwargs = blueprint_kwargs or {}
+
+    def __repr__(self):
+        return f'<BookEntry (index: {self.index}, item: "{self.item}", ' \
+               f'label: "{self.label}")>'
+
+    @classmethod
+    def from_blueprint(cls, blueprint, index):
+        entry = cls({cls._item_of(blueprint): None, 'index': index})
+        entry.__blueprint = blueprint
+        return entry
+
+    @staticmethod
+    def _item_of(blueprint):
+        for item, klass in _entry_types().items():
+            if isinstance(blueprint, klass):
+                return item
+        raise TypeError(f"{blueprint} can't be added to a blueprint book")
+
+    @property
+    def loaded(self):
+        return self.__blueprint is not None
+
+    @property
+    def dirty(self):
+        """ Whether the entry has to be serialized again. Entries that were
+        built into a Blueprint always are, as there is no telling if it
+        was changed. """
+        return self.__dirty or self.loaded or self.index != self.__raw_index
+
+    def mark_dirty(self):
+        self.__dirty = True
+
+    def _raw(self):
+        return self.__data[self.item]
+
+    def _raw_json(self):
+        return self.__raw_json
+
+    @property
+    def label(self):
+        if self.loaded:
+            return self.__blueprint.label
+        return self._raw().get('label')
+
+    @property
+    def blueprint(self):
+        """ The Blueprint (or Book) of this entry, built on first access.
+        Entries without a model, like deconstruction planners, return
+        their json. """
+        if self.__blueprint is None:
+            klass = _entry_types().get(self.item)
+            if klass is None:
+                # Handed out to be changed in place.
+                self.mark_dirty()
+                return self._raw()
+            self.__blueprint = klass(
+                data={self.item: self._raw()},
+                **self.__blueprint_kwargs)
+            self.__data = None
+        return self.__blueprint
+
+    def to_json(self):
+        if self.loaded:
+            obj = self.__blueprint.to_json()
+        else:
+            obj = {self.item: self._raw()}
+        obj['index'] = self.index
+        return obj
+
+    def to_bytes(self, dumps):
+        """ Returns the serialized json of the entry, reusing the json it
+        was loaded from when possible """
+        if not self.dirty:
+            raw = self._raw_json()
+            if raw is not None:
+                return raw
+        return dumps(self.to_json())
+
+
+class IndexedBookEntry(BookEntry):
+    """ A book entry of which only the BookIndex record is known. Its json
+    is read from the exchange string when it is first needed. """
+    def __init__(self, record, source, blueprint_kwargs=None,
+                 json_backend=None):
+        super().__init__(
+            {record['item']: None, 'index': record['index']},
+            blueprint_kwargs)
+        self.record = record
+        self.__source = source
+        self.__json_backend = json_backend
+        self.__raw = None
+
+    def _raw(self):
+        if self.__raw is None:
+            loads, _ = util._get_json_backend(self.__json_backend)
+            self.__raw = loads(self._raw_json())[self.item]
+        return self.__raw
+
+    def _raw_json(self):
+        offset = self.record['offset']
+        return self.__source.read(offset, offset + self.record['length'])
+
+    @property
+    def label(self):
+        if self.loaded:
+            return super().label
+        return self.record['label']
+
+    @property
+    def blueprint(self):
+        blueprint = super().blueprint
+        if self.loaded:
+            self.__raw = None
+        return blueprint
+
+
+class _InflatedString:
+    """ The json of an exchange string, inflated only as far as it has
+    been read. Only the data after the last read is kept, reading from
+    before it inflates the string again from the start. """
+    def __init__(self, string):
+        self.__string = string
+        self.__rewind()
+
+    def __rewind(self):
+        self.__chunks = util._iter_inflate(self.__string)
+        self.__data = bytearray()
+        # Position of the start of __data in the whole json.
+        self.__offset = 0
+
+    def read(self, start, end):
+        if start < self.__offset:
+            self.__rewind()
+        while self.__offset + len(self.__data) < end:
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                raise InvalidExchangeString(
+                    "Book index does not match the exchange string")
+            self.__data += chunk
+        data = bytes(
+            self.__data[start - self.__offset:end - self.__offset])
+        del self.__data[:end - self.__offset]
+        self.__offset = end
+        return data
+
+
+class BookIndex:
+    """ Where every entry of a blueprint book is found in the inflated
+    json of its exchange string, along with the entry's index, item,
+    label and entity and tile counts. Built once by scanning the string,
+    it can be saved next to the string to skip the scan afterwards. """
+    def __init__(self, digest, envelope, records):
+        self.digest = digest
+        self.envelope = envelope
+        self.records = records
+
+    def __repr__(self):
+        return f'<BookIndex ({len(self)} entries)>'
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @staticmethod
+    def digest_of(string):
+        if isinstance(string, str):
+            string = string.encode('ascii')
+        return hashlib.sha256(string.strip()).hexdigest()
+
+    @classmethod
+    def build(cls, string):
+        """ Scans the string for the entries of the book. Only the record
+        of every entry is kept, not the entry itself, so the book is
+        never held in memory whole. """
+        scanner = util._BookScanner()
+        records = [
+            cls._record(offset, raw, child)
+            for offset, raw, child in _iter_book(string, scanner)]
+        return cls(
+            cls.digest_of(string), json.loads(scanner.envelope), records)
+
+    @staticmethod
+    def _record(offset, raw, child):
+        item = next(key for key in child if key != 'index')
+        value = child[item]
+        return {
+            'index': child.get('index'),
+            'item': item,
+            'label': value.get('label'),
+            'entities': len(value.get('entities', ())),
+            'tiles': len(value.get('tiles', ())),
+            'offset': offset,
+            'length': len(raw),
+        }
+
+    @classmethod
+    def load(cls, filename, string=None):
+        """ Reads an index from a file. If string is given, returns None
+        when the index was not built from it. """
+        with open(filename, 'rb') as f:
+            data = json.loads(f.read())
+        if data.get('format') != _INDEX_FORMAT:
+            raise ValueError(f"Unsupported book index format in {filename}")
+        index = cls(data['digest'], data['envelope'], data['records'])
+        if string is not None and index.digest != cls.digest_of(string):
+            return None
+        return index
+
+    def save(self, filename):
+        path = f"{filename}.{os.getpid()}.tmp"
+        with open(path, 'w') as f:
+            json.dump({
+                'format': _INDEX_FORMAT,
+                'digest': self.digest,
+                'envelope': self.envelope,
+                'records': self.records,
+            }, f)
+        os.replace(path, filename)
+
+
+def _iter_book(string, scanner):
+    """ Yields an (offset, raw json, parsed json) tuple for every entry of
+    a blueprint book as soon as it is read. Afterwards scanner.envelope
+    holds the json of the book without its entries. """
+    for chunk in util._iter_inflate(string):
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+    if not scanner.is_book:
+        raise ValueError("Exchange string is not a blueprint book")
+
+
+def _scan_book(string):
+    """ Returns the json of a blueprint book without its entries, and an
+    (offset, raw json, parsed json) tuple for every entry """
+    scanner = util._BookScanner()
+    children = list(_iter_book(string, scanner))
+    return json.loads(scanner.envelope), children
 
 
 class Book:
-    def __init__(self, data, **kwargs):
-        self.name = 'blueprint-book'
-        self.label = ''
+    def __init__(self, string=None, data=None, **kwargs):
+        """ kwargs are passed on to the Blueprints of the book.
+
+        The json of every entry of a book read from a string is kept, so
+        to_string only has to serialize the entries that are dirty. """
+        self.item = 'blueprint-book'
+        self.label = None
         self.label_color = None
-        self.blueprints = []
+        self.description = None
+        self.icons = []
         self.active_index = 0
         self.version = 0
+        self.entries = []
+        self.blueprint_kwargs = kwargs
+
+        if string is not None:
+            envelope, children = _scan_book(string)
+            self.load(envelope)
+            self.entries = [
+                BookEntry(child, kwargs, raw)
+                for offset, raw, child in children]
+        elif data is not None:
+            self.load(data)
+
+    @classmethod
+    def from_index(cls, string, index=None, *, json_backend=None, **kwargs):
+        """ Builds a Book from an exchange string and its BookIndex. Entry
+        json is only read from the string, and parsed, when the entry is
+        first needed. """
+        if index is None:
+            index = BookIndex.build(string)
+        book = cls(data=index.envelope, **kwargs)
+        source = _InflatedString(string)
+        book.entries = [
+            IndexedBookEntry(record, source, kwargs, json_backend)
+            for record in index]
+        return book
+
+    @classmethod
+    def open(cls, filename, **kwargs):
+        """ Reads a Book from a file holding an exchange string. The
+        index of the book is kept next to the file, and rebuilt when it
+        no longer matches the string. """
+        with open(filename) as f:
+            string = f.read().strip()
+        path = index_filename(filename)
+        try:
+            index = BookIndex.load(path, string)
+        except (OSError, ValueError, KeyError):
+            index = None
+        if index is None:
+            index = BookIndex.build(string)
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.debug(f"Could not write book index {path}: {e}")
+        return cls.from_index(string, index, **kwargs)
+
+    def __repr__(self):
+        return f'<Book (label: "{self.label}", entries: {len(self)})>'
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        for entry in self.entries:
+            yield entry.blueprint
+
+    def __getitem__(self, i):
+        return self.entries[i].blueprint
+
+    def load(self, data):
+        if 'blueprint_book' in data:
+            data = data['blueprint_book']
+
+        self.item = data.get('item', 'blueprint-book')
+        self.label = data.get('label', None)
+        label_color = data.get('label_color', None)
+        if label_color is not None:
+            self.label_color = Color(**label_color)
+        self.description = data.get('description', None)
+        self.icons = data.get('icons', [])
+        self.active_index = data.get('active_index', 0)
+        self.version = data.get('version', 0)
+        self.entries = [
+            BookEntry(entry, self.blueprint_kwargs)
+            for entry in data.get('blueprints', [])]
+        logger.debug(self)
+
+    @property
+    def labels(self):
+        return [entry.label for entry in self.entries]
+
+    def get(self, index):
+        """ Returns the blueprint in the given slot of the book """
+        for entry in self.entries:
+            if entry.index == index:
+                return entry.blueprint
+        raise IndexError(index)
+
+    def find(self, label):
+        """ Returns the first blueprint with the given label """
+        for entry in self.entries:
+            if entry.label == label:
+                return entry.blueprint
+        raise KeyError(label)
+
+    def add(self, blueprint, index=None):
+        """ Adds a Blueprint or Book to the book, by default in the slot
+        after the last one in use """
+        if index is None:
+            index = max(
+                (entry.index for entry in self.entries), default=-1) + 1
+        self.entries.append(BookEntry.from_blueprint(blueprint, index))
+
+    def _envelope_json(self):
+        obj = {
+            'item': self.item,
+        }
+        obj_set(obj, 'label', self.label)
+        obj_set(obj, 'label_color', self.label_color)
+        obj_set(obj, 'description', self.description)
+        if self.icons:
+            obj['icons'] = self.icons
+        obj['blueprints'] = []
+        obj['active_index'] = self.active_index
+        obj['version'] = self.version
+        return obj
+
+    def to_json(self):
+        obj = self._envelope_json()
+        obj['blueprints'] = [entry.to_json() for entry in self.entries]
+        return {'blueprint_book': obj}
+
+    def to_string(self, json_backend=None, compression=None):
+        _, dumps = util._get_json_backend(json_backend)
+        envelope = dumps({'blueprint_book': self._envelope_json()})
+        # Strings in the envelope have their quotes escaped, so this can
+        # only match the (still empty) list of entries.
+        blueprints = b','.join(
+            entry.to_bytes(dumps) for entry in self.entries)
+        data = envelope.replace(
+            b'"blueprints":[]', b'"blueprints":[' + blueprints + b']', 1)
+        return util._encode_json_0(data, compression)
+
+
+def _entry_types():
+    return {'blueprint': Blueprint, 'blueprint_book': Book}
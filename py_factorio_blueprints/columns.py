@@ -0,0 +1,201 @@
+from py_factorio_blueprints.util import Direction, Vector, _vector
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class EntityColumns:
+    """ Positions, directions and names of the entities of a layer, kept
+    in parallel numpy arrays with a row per entity.
+
+    Entities attached to the columns read and write their position and
+    direction from their row, so transforms of the whole layer are done
+    as array operations instead of once per entity. Names are interned,
+    the name_id column holds the index into names.
+
+    x_int and y_int tell whether a coordinate is an int rather than a
+    float. Positions are handed out with the type they would have had
+    without the columns, so the json written is the same either way. """
+    __COLUMNS = ('x', 'y', 'direction', 'name_id', 'x_int', 'y_int')
+
+    def __init__(self, capacity=64):
+        if numpy is None:
+            raise ImportError("EntityColumns needs numpy")
+        self.x = numpy.zeros(capacity, dtype=numpy.float64)
+        self.y = numpy.zeros(capacity, dtype=numpy.float64)
+        self.direction = numpy.zeros(capacity, dtype=numpy.int8)
+        self.name_id = numpy.zeros(capacity, dtype=numpy.int32)
+        self.x_int = numpy.zeros(capacity, dtype=bool)
+        self.y_int = numpy.zeros(capacity, dtype=bool)
+        self.names = []
+        self.__name_ids = {}
+        # Row -> entity
+        self.objs = []
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __repr__(self):
+        return f"<EntityColumns ({len(self)} rows)>"
+
+    def intern(self, name):
+        try:
+            return self.__name_ids[name]
+        except KeyError:
+            name_id = self.__name_ids[name] = len(self.names)
+            self.names.append(name)
+            return name_id
+
+    def __grow(self):
+        capacity = 2 * len(self.x)
+        for column in self.__COLUMNS:
+            old = getattr(self, column)
+            new = numpy.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, column, new)
+
+    def attach(self, obj):
+        """ Gives obj a row, filled in from its current values """
+        position, direction = obj.position, obj.direction
+        row = len(self.objs)
+        if row == len(self.x):
+            self.__grow()
+        self.set_position(row, position)
+        self.direction[row] = direction
+        self.name_id[row] = self.intern(str(obj.name))
+        self.objs.append(obj)
+        obj._columns = self
+        obj._row = row
+
+    def detach(self, obj):
+        """ Frees the row of obj and returns the position and direction it
+        held. The last row is moved into the freed one. """
+        row = obj._row
+        values = self.position(row), self.get_direction(row)
+        last = len(self.objs) - 1
+        if row != last:
+            moved = self.objs[last]
+            for name in self.__COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last]
+            self.objs[row] = moved
+            moved._row = row
+        self.objs.pop()
+        obj._columns = None
+        obj._row = None
+        return values
+
+    def position(self, row):
+        x, y = float(self.x[row]), float(self.y[row])
+        if self.x_int[row]:
+            x = int(x)
+        if self.y_int[row]:
+            y = int(y)
+        return _vector(x, y)
+
+    def set_position(self, row, value):
+        if type(value) is not Vector:
+            value = Vector(value)
+        self.x[row] = value.x
+        self.y[row] = value.y
+        self.x_int[row] = isinstance(value.x, int)
+        self.y_int[row] = isinstance(value.y, int)
+
+    def get_direction(self, row):
+        return Direction(int(self.direction[row]))
+
+    def set_direction(self, row, value):
+        self.direction[row] = Direction(value)
+
+    def set_name(self, row, name):
+        self.name_id[row] = self.intern(str(name))
+
+    def rows(self, objs):
+        """ Returns the rows of the given attached objects """
+        return numpy.fromiter(
+            (obj._row for obj in objs), dtype=numpy.intp, count=len(objs))
+
+    def translate(self, dx, dy):
+        size = len(self)
+        self.x[:size] += dx
+        self.y[:size] += dy
+        # Adding a float makes a float of an int.
+        if not isinstance(dx, int):
+            self.x_int[:size] = False
+        if not isinstance(dy, int):
+            self.y_int[:size] = False
+
+    def rotate_positions(self, amount, around=(0, 0)):
+        """ Rotates every position amount quarter turns clockwise around
+        the given point """
+        amount %= 4
+        if not amount:
+            return
+        size = len(self)
+        cx, cy = around
+        x = self.x[:size] - cx
+        y = self.y[:size] - cy
+        x_int = self.x_int[:size] & isinstance(cx, int)
+        y_int = self.y_int[:size] & isinstance(cy, int)
+        if amount == 2:
+            x, y = -x, -y
+        else:
+            x_int, y_int = y_int, x_int
+            if amount == 1:
+                x, y = -y, x
+            else:
+                x, y = y, -x
+        self.x[:size] = x + cx
+        self.y[:size] = y + cy
+        self.x_int[:size] = x_int & isinstance(cx, int)
+        self.y_int[:size] = y_int & isinstance(cy, int)
+
+    def flip_positions(self, axis, around=(0, 0)):
+        """ Mirrors every position across the line through the given
+        point, 'horizontal' mirrors x and 'vertical' mirrors y """
+        size = len(self)
+        if axis == 'horizontal':
+            x, x_int = self.x, self.x_int
+            center = around[0]
+        else:
+            x, x_int = self.y, self.y_int
+            center = around[1]
+        x[:size] = center - (x[:size] - center)
+        if not isinstance(center, int):
+            x_int[:size] = False
+
+    def rotate_directions(self, amount, rows):
+        """ Turns the directions of the given rows amount quarter turns
+        clockwise """
+        rows = numpy.asarray(rows, dtype=numpy.intp)
+        self.direction[rows] = (self.direction[rows] + 2 * amount) % 8
+
+    def sorted(self, objs):
+        """ Returns the given attached objects ordered by y, then x, like
+        BlueprintLayer.sort() does """
+        rows = self.rows(objs)
+        order = numpy.lexsort((self.x[rows], self.y[rows]))
+        return [objs[i] for i in order]
+
+    def bounds(self, box_of):
+        """ Returns the right, left, bottom and top most edges of the
+        entities, as maximum_values does. box_of(name, direction) gives
+        the (top_left, bottom_right) box of a prototype. """
+        size = len(self)
+        if not size:
+            return float('-inf'), float('inf'), float('-inf'), float('inf')
+        # Boxes only depend on whether the direction is turned sideways.
+        sideways = (self.direction[:size] // 2) % 2
+        boxes = numpy.empty((len(self.names), 2, 4))
+        for name_id, name in enumerate(self.names):
+            for turned in (0, 1):
+                top_left, bottom_right = box_of(name, 2 * turned)
+                boxes[name_id, turned] = (
+                    top_left.x, top_left.y, bottom_right.x, bottom_right.y)
+        rows = boxes[self.name_id[:size], sideways]
+        x, y = self.x[:size], self.y[:size]
+        return (
+            int((x + rows[:, 2]).max()), int((x + rows[:, 0]).min()),
+            int((y + rows[:, 3]).max()), int((y + rows[:, 1]).min()))
@@ -1,19 +1,105 @@
 from py_factorio_blueprints.util import \
-    Vector, NameStr, Connection, Direction, ControlBehaviorMeta
+    Vector, NameStr, Connection, Direction, ControlBehaviorMeta, _ZERO, \
+    _vector, _quarter_turns, _TURNED_DIRECTIONS, _flip_axis
 from py_factorio_blueprints.entity_mixins import \
-    BaseMixin, SignalName, Base
+    BaseMixin, SignalName, Base, Rotatable
 from py_factorio_blueprints.exceptions import *
 
 
+# Entity classes composed from mixins, keyed by their bases. Shared so that
+# every entity with the same prototype ends up with the same class.
+_composed_classes = {}
+
+
+def _compose(*bases):
+    try:
+        return _composed_classes[bases]
+    except KeyError:
+        cls = _composed_classes[bases] = type('Entity', bases, {})
+        return cls
+
+
+# Entity class -> how its mixins rotate, see _rotation_kind.
+_rotation_kinds = {}
+
+
+def _rotation_kind(cls):
+    """ Returns None if the mixins of an entity class don't rotate,
+    'direction' if they only turn the direction (Rotatable), and 'mixin'
+    if the mixin rotate() has to be called """
+    try:
+        return _rotation_kinds[cls]
+    except KeyError:
+        rotating = [
+            klass for klass in cls.__mro__
+            if 'rotate' in klass.__dict__ and klass is not Entity]
+        if not rotating:
+            kind = None
+        elif rotating == [Rotatable]:
+            kind = 'direction'
+        else:
+            kind = 'mixin'
+        _rotation_kinds[cls] = kind
+        return kind
+
+
+# Entity class -> whether any of its mixins has a flip() method.
+_flipping = {}
+
+
+def _flips(cls):
+    try:
+        return _flipping[cls]
+    except KeyError:
+        flips = _flipping[cls] = any(
+            'flip' in klass.__dict__ and klass is not Entity
+            for klass in cls.__mro__)
+        return flips
+
+
+def _footprint_changed(instance):
+    layer = getattr(instance, '_blueprint_layer', None)
+    if layer is not None:
+        layer._update(instance)
+
+
+class EntityNumberField:
+    """ The imported id of an entity. The layer keeps a map of these, so
+    it is told about every change. """
+    def __set_name__(self, owner, name):
+        self.name = "__" + name
+
+    def __set__(self, instance, value):
+        old = getattr(instance, self.name, None)
+        setattr(instance, self.name, value)
+        layer = getattr(instance, '_blueprint_layer', None)
+        if layer is not None:
+            layer._id_changed(instance, old)
+
+    def __get__(self, instance, owner):
+        return getattr(instance, self.name, None)
+
+
 class PositionField:
     def __set_name__(self, owner, name):
         self.name = "__" + name
 
     def __set__(self, instance, value):
-        setattr(instance, self.name, Vector(value))
+        columns = instance._columns
+        if columns is not None:
+            columns.set_position(instance._row, value)
+        else:
+            setattr(instance, self.name, Vector(value))
+        _footprint_changed(instance)
 
     def __get__(self, instance, owner):
-        return getattr(instance, self.name, Vector(0, 0))
+        columns = getattr(instance, '_columns', None)
+        if columns is not None:
+            return columns.position(instance._row)
+        try:
+            return getattr(instance, self.name)
+        except AttributeError:
+            return _vector(0, 0)
 
 
 class DirectionField:
@@ -21,9 +107,17 @@ class DirectionField:
         self.name = "__" + name
 
     def __set__(self, instance, value):
-        setattr(instance, self.name, Direction(value))
+        columns = instance._columns
+        if columns is not None:
+            columns.set_direction(instance._row, value)
+        else:
+            setattr(instance, self.name, Direction(value))
+        _footprint_changed(instance)
 
     def __get__(self, instance, owner):
+        columns = getattr(instance, '_columns', None)
+        if columns is not None:
+            return columns.get_direction(instance._row)
         return getattr(instance, self.name, Direction(0))
 
 
@@ -77,6 +171,7 @@ class EntityName(Base):
     def __set__(self, instance, value):
         if not getattr(instance, 'strict', True):
             setattr(instance, self._name, value)
+            _footprint_changed(instance)
             return
 
         from py_factorio_blueprints.blueprint import Blueprint
@@ -95,6 +190,7 @@ class EntityName(Base):
         from py_factorio_blueprints.entity_prototypes import entity_prototypes
         mixins = entity_prototypes[prototype].get('mixins', [])
         instance.add_mixins(*custom_mixins, *mixins)
+        _footprint_changed(instance)
 
     def __get__(self, instance, owner):
         return EntityName.NameStr(getattr(instance, self._name, ""))
@@ -102,9 +198,17 @@ class EntityName(Base):
 
 class Entity(BaseMixin):
     ID = 'entity_number'
+    entity_number = EntityNumberField()
     name = EntityName()
     position = PositionField()
     direction = DirectionField()
+    # The position of an entity is its center, turning it needs no
+    # offset, see Tile._CORNERS.
+    _CORNERS = ((0, 0),) * 4
+    # Set while the position and direction are kept in the EntityColumns
+    # of the layer, see BlueprintLayer.use_columns().
+    _columns = None
+    _row = None
 
     def __repr__(self):
         return f'<Entity (name: "{self.name}", position: ' \
@@ -115,11 +219,11 @@ class Entity(BaseMixin):
 
     def set_mixins(self, *mixins):
         """ Resets self to the base Entity class and adds the given mixins """
-        self.__class__ = type('Entity', (Entity, *mixins), {})
+        self.__class__ = _compose(Entity, *mixins)
 
     def add_mixins(self, *mixins):
         """ Adds additional mixins to the current self class """
-        self.__class__ = type('Entity', (self.__class__, *mixins), {})
+        self.__class__ = _compose(self.__class__, *mixins)
 
     def __init__(self, *args, name, position, strict=True,
                  blueprint_layer=None,
@@ -142,6 +246,18 @@ class Entity(BaseMixin):
 
         super().__init__(*args, **kwargs)
 
+    @property
+    def _auto_entity_number(self):
+        # Numbers are handed out lazily by the layer, make sure they are
+        # current before anyone reads one.
+        if self._blueprint_layer is not None:
+            self._blueprint_layer._refresh()
+        return self.__auto_entity_number
+
+    @_auto_entity_number.setter
+    def _auto_entity_number(self, value):
+        self.__auto_entity_number = value
+
     @property
     def blueprint(self):
         try:
@@ -151,8 +267,7 @@ class Entity(BaseMixin):
 
     def get_connections(self):
         connections = [connection.orientate(self)
-                       for connection in self.blueprint.connections
-                       if connection.attached_to(self)]
+                       for connection in self.blueprint.connections.of(self)]
         return sorted(
             connections, key=lambda x: (
                 x.from_entity._auto_entity_number,
@@ -165,8 +280,7 @@ class Entity(BaseMixin):
             to_side='in',
             color='red'):
         conn = Connection(self, to_entity, from_side, to_side, color)
-        if conn not in self.blueprint.connections:
-            self.blueprint.connections.append(conn)
+        self.blueprint.connections.add(conn)
         return conn
 
     def connections_to_json(self):
@@ -199,58 +313,98 @@ class Entity(BaseMixin):
 
     @property
     def top_left(self):
-        top_left, bottom_right = self.selection_box
+        top_left, bottom_right = self._selection_box
         return self.position + top_left
 
     @property
     def top_right(self):
-        top_left, bottom_right = self.selection_box
+        top_left, bottom_right = self._selection_box
         return self.position + Vector(bottom_right.x, top_left.y)
 
     @property
     def bottom_left(self):
-        top_left, bottom_right = self.selection_box
+        top_left, bottom_right = self._selection_box
         return self.position + Vector(top_left.x, bottom_right.y)
 
     @property
     def bottom_right(self):
-        top_left, bottom_right = self.selection_box
+        top_left, bottom_right = self._selection_box
         return self.position + bottom_right
 
     @property
     def selection_box(self):
-        selection_box = self.name.selection_box
-        def r(box):
-            top_left, bottom_right = box
-            return top_left.yx, bottom_right.yx
+        from py_factorio_blueprints.blueprint import Blueprint
+        return Blueprint.get_selection_box(self.name, self.direction)
 
-        for _ in range(self.direction // 2):
-            selection_box = r(selection_box)
+    @property
+    def _selection_box(self):
+        # Shared with every entity of the prototype, for internal use.
+        from py_factorio_blueprints.blueprint import Blueprint
+        return Blueprint._selection_box(self.name, self.direction)
 
-        return selection_box
+    @property
+    def collision_box(self):
+        from py_factorio_blueprints.blueprint import Blueprint
+        return Blueprint.get_collision_box(self.name, self.direction)
 
     def collides(self, position):
-        top_left, bottom_right = self.selection_box
-        position -= self.position
-        return top_left < position < bottom_right
+        if type(position) is tuple:
+            position = Vector(position)
+        top_left, bottom_right = self._selection_box
+        own_position = self.position
+        x = position.x - own_position.x
+        y = position.y - own_position.y
+        return top_left.x < x < bottom_right.x and \
+            top_left.y < y < bottom_right.y
 
     def rotate(self, amount,
-               around=Vector(0, 0), direction=Direction.CLOCKWISE):
-        position = self.position - around
-        amount %= 4
-        if direction != Direction.CLOCKWISE:
-            amount %= 4 - amount
-
-        def r(v):
-            return Vector(-v.y, v.x)
-
-        for _ in range(amount):
-            position = r(position)
-        self.position = position + around
-
-        mixin = super()
-        if hasattr(mixin, "rotate"):
-            mixin.rotate(amount)
+               around=_ZERO, direction=Direction.CLOCKWISE):
+        amount = _quarter_turns(amount, direction)
+        self.position = (self.position - around).rotate(amount) + around
+        self._rotate_mixins(amount)
+
+    def _move(self, position):
+        """ Moves the entity to position without telling the layer. For
+        layers moving all their objects at once. """
+        self.__dict__['__position'] = position
+
+    def _turn(self, position, amount):
+        """ Moves the entity to position and turns its mixins amount
+        clockwise quarter turns, without telling the layer. For layers
+        turning all their objects at once. """
+        # Where PositionField and DirectionField keep their values.
+        values = self.__dict__
+        values['__position'] = position
+        kind = _rotation_kind(type(self))
+        if kind == 'direction':
+            values['__direction'] = _TURNED_DIRECTIONS[amount][
+                values.get('__direction', 0)]
+        elif kind is not None:
+            super().rotate(amount)
+
+    def flip(self, axis, around=_ZERO):
+        """ Mirrors the entity across the line through around, see
+        Blueprint.flip() """
+        _flip_axis(axis)
+        self.position = (self.position - around).flip(axis) + around
+        if _flips(type(self)):
+            super().flip(axis)
+
+    def _mirror(self, position, axis):
+        """ Moves the entity to position and mirrors its mixins, without
+        telling the layer about the move. See _turn(). """
+        self.__dict__['__position'] = position
+        if _flips(type(self)):
+            super().flip(axis)
+
+    def _rotate_mixins(self, amount):
+        """ Turns whatever the mixins turn, amount clockwise quarter turns.
+        The direction of Rotatable entities is looked up. """
+        kind = _rotation_kind(type(self))
+        if kind == 'direction':
+            self.direction = _TURNED_DIRECTIONS[amount][self.direction]
+        elif kind is not None:
+            super().rotate(amount)
 
     def to_json(self, obj=None):
         if obj is None:
@@ -1,5 +1,6 @@
 from py_factorio_blueprints.util import (
-    NameStr, Vector, Color as ColorObj, Condition, obj_set, ControlBehaviorMeta)
+    NameStr, Vector, Color as ColorObj, Condition, obj_set, ControlBehaviorMeta,
+    Direction)
 from py_factorio_blueprints.exceptions import *
 
 
@@ -367,6 +368,16 @@ class Orientation(BaseMixin):
         if hasattr(sup, 'rotate'):
             sup.rotate(amount, **kwargs)
 
+    def flip(self, axis, **kwargs):
+        if self.orientation is not None:
+            if axis == 'horizontal':
+                self.orientation = (1 - self.orientation) % 1
+            else:
+                self.orientation = (0.5 - self.orientation) % 1
+        sup = super()
+        if hasattr(sup, 'flip'):
+            sup.flip(axis, **kwargs)
+
 
 class Train(Orientation):
     def __init__(self, *args, orientation=None, **kwargs):
@@ -610,6 +621,24 @@ class Inserter(BaseMixin):
             value = int(value)
         self.__override_stack_size = value
 
+    def rotate(self, amount, **kwargs):
+        if self.pickup_position is not None:
+            self.pickup_position = self.pickup_position.rotate(amount)
+        if self.drop_position is not None:
+            self.drop_position = self.drop_position.rotate(amount)
+        sup = super()
+        if hasattr(sup, 'rotate'):
+            sup.rotate(amount, **kwargs)
+
+    def flip(self, axis, **kwargs):
+        if self.pickup_position is not None:
+            self.pickup_position = self.pickup_position.flip(axis)
+        if self.drop_position is not None:
+            self.drop_position = self.drop_position.flip(axis)
+        sup = super()
+        if hasattr(sup, 'flip'):
+            sup.flip(axis, **kwargs)
+
     def to_json(self, obj):
         obj_set(obj, 'override_stack_size', self.override_stack_size)
         obj_set(obj, 'pickup_position', self.pickup_position)
@@ -866,12 +895,38 @@ class Rotatable(BaseMixin):
         if hasattr(sup, "rotate"):
             sup.rotate(amount, **kwargs)
 
+    def flip(self, axis, **kwargs):
+        self.direction = self.flipped_direction(axis)
+        sup = super()
+        if hasattr(sup, "flip"):
+            sup.flip(axis, **kwargs)
+
+    def flipped_direction(self, axis):
+        return self.direction.flip(axis)
+
     def to_json(self, obj):
         if not self.direction.is_up:
             obj['direction'] = self.direction
         return super().to_json(obj)
 
 
+class StraightRail(Rotatable):
+    def flipped_direction(self, axis):
+        # Straight pieces look the same either way, only the diagonal
+        # ones change.
+        if self.direction % 2 == 0:
+            return self.direction
+        return super().flipped_direction(axis)
+
+
+class CurvedRail(Rotatable):
+    def flipped_direction(self, axis):
+        # Mirroring a curve swaps the two curves leaving the same side.
+        if axis == 'horizontal':
+            return Direction(1 - self.direction)
+        return Direction(5 - self.direction)
+
+
 class Silo(BaseMixin):
     def __init__(self, *args, auto_launch=None, **kwargs):
         self.auto_launch = auto_launch
@@ -1009,6 +1064,14 @@ class Splitter(BaseMixin):
             raise ValueError(value)
         self.__output_priority = value
 
+    def flip(self, axis, **kwargs):
+        swapped = {None: None, 'left': 'right', 'right': 'left'}
+        self.input_priority = swapped[self.input_priority]
+        self.output_priority = swapped[self.output_priority]
+        sup = super()
+        if hasattr(sup, 'flip'):
+            sup.flip(axis, **kwargs)
+
     def to_json(self, obj):
         obj_set(obj, 'input_priority', self.input_priority)
         obj_set(obj, 'output_priority', self.output_priority)
@@ -81,10 +81,10 @@ entity_prototypes = {
     },
     'radar': {},
     'curved-rail': {
-        'mixins': [Rotatable]
+        'mixins': [CurvedRail]
     },
     'straight-rail': {
-        'mixins': [Rotatable]
+        'mixins': [StraightRail]
     },
     'rail-chain-signal': {
         'mixins': [ChainSignal, Rotatable]
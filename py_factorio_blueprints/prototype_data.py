@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sys
+from collections.abc import Mapping
+
+
+logger = logging.getLogger('py_factorio_blueprints.prototype_data')
+
+CACHE_SUFFIX = '.cache'
+
+# Bump whenever the layout of the cache files changes.
+_CACHE_FORMAT = 2
+# marshal output is only guaranteed to be readable by the same version.
+_CACHE_TAG = (_CACHE_FORMAT, sys.implementation.cache_tag, marshal.version)
+
+
+def cache_filename(filename):
+    return f"{filename}{CACHE_SUFFIX}"
+
+
+class PrototypeTable(Mapping):
+    """ Read only mapping of prototype names to prototype data, unpacked
+    from a cache snapshot on demand. The list of names is unpacked on
+    first use, each prototype the first time it is looked up. """
+    def __init__(self, packed):
+        self.__packed = packed
+        self.__index = None
+        self.__prototypes = {}
+
+    def __unpack_index(self):
+        if self.__index is None:
+            self.__index = marshal.loads(self.__packed)
+            self.__packed = None
+        return self.__index
+
+    def __getitem__(self, name):
+        try:
+            return self.__prototypes[name]
+        except KeyError:
+            prototype = marshal.loads(self.__unpack_index()[name])
+            self.__prototypes[name] = prototype
+            return prototype
+
+    def __contains__(self, name):
+        return name in self.__prototypes or name in self.__unpack_index()
+
+    def __iter__(self):
+        return iter(self.__unpack_index())
+
+    def __len__(self):
+        return len(self.__unpack_index())
+
+    def __repr__(self):
+        return f"<PrototypeTable ({len(self)} prototypes)>"
+
+
+def load(filename, cache=True):
+    """ Returns the parsed contents of a prototype data json file.
+
+    With cache enabled a marshal snapshot of the data is kept next to the
+    json file, which is used instead of the json for as long as the json
+    file does not change. Sections read from the snapshot are returned as
+    PrototypeTables, so prototypes that are never looked up are never
+    unpacked. """
+    if not cache:
+        with open(filename, 'rb') as f:
+            return json.loads(f.read())
+
+    stat = os.stat(filename)
+    cached = _read_cache(filename, stat)
+    if cached is not None:
+        return cached
+
+    with open(filename, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw)
+    _write_cache(filename, stat, hashlib.sha256(raw).hexdigest(), data)
+    return data
+
+
+def _read_cache(filename, stat):
+    try:
+        with open(cache_filename(filename), 'rb') as f:
+            tag, mtime, size, digest, payload = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if tag != _CACHE_TAG:
+        return None
+    if (mtime, size) != (stat.st_mtime_ns, stat.st_size):
+        # Touched, but possibly not changed.
+        with open(filename, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != digest:
+                return None
+    return {
+        section: PrototypeTable(value) if type(value) is bytes else value
+        for section, value in marshal.loads(payload).items()}
+
+
+def _pack(data):
+    # Every prototype table is stored as a dict of separately marshalled
+    # prototypes, itself marshalled, so it can be unpacked piece by piece.
+    return marshal.dumps({
+        section: marshal.dumps({
+            name: marshal.dumps(prototype)
+            for name, prototype in value.items()})
+        if type(value) is dict else value
+        for section, value in data.items()})
+
+
+def _write_cache(filename, stat, digest, data):
+    if type(data) is not dict:
+        return
+    path = cache_filename(filename)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    header = (_CACHE_TAG, stat.st_mtime_ns, stat.st_size, digest)
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(marshal.dumps((*header, _pack(data))))
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.debug(f"Could not write prototype cache {path}: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
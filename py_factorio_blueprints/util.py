@@ -1,38 +1,407 @@
+import concurrent.futures
+import functools
 import json
 import zlib
 import base64
 import math
+import re
 from py_factorio_blueprints.exceptions import *
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def _decode_0(string):
+
+def _json_dumps(obj):
+    return json.dumps(
+        obj, separators=(',', ':'), ensure_ascii=False).encode('UTF-8')
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+# name -> (loads, dumps). loads takes UTF-8 bytes, dumps returns them, as
+# compact json. The output is not always the same: orjson writes some
+# floats differently (0.00001 and 1e16 where json writes 1e-05 and
+# 1e+16), writes NaN as null and can't write ints over 64 bits. So json
+# is the default, and output only changes when orjson is asked for.
+_json_backends = {
+    'json': (json.loads, _json_dumps),
+}
+if orjson is not None:
+    _json_backends['orjson'] = (orjson.loads, _orjson_dumps)
+
+_json_backend = 'json'
+
+
+def json_backends():
+    """ Returns the names of the available json backends """
+    return list(_json_backends)
+
+
+def set_json_backend(name):
+    """ Sets the json backend used by encode and decode by default """
+    global _json_backend
+    _get_json_backend(name)
+    _json_backend = name
+
+
+def _get_json_backend(name=None):
+    if name is None:
+        name = _json_backend
     try:
-        data = json.loads(
-            zlib.decompress(
-                base64.b64decode(string[1:])).decode('UTF-8'))
+        return _json_backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable json backend: {name}")
+
+
+def _json_backend_name(name=None):
+    """ Returns the name of the backend to use, checking it is available.
+    Work handed to other processes is given the name, as the default set
+    by set_json_backend() is not carried over to them. """
+    if name is None:
+        name = _json_backend
+    _get_json_backend(name)
+    return name
+
+
+# name -> zlib.compressobj arguments. wbits has to stay between 9 and 15,
+# the game only reads zlib streams.
+COMPRESSION_PROFILES = {
+    'fastest': {'level': 1, 'memLevel': 9},
+    'default': {},
+    'smallest': {'level': 9, 'memLevel': 9},
+}
+
+
+def _compress(data, compression=None):
+    if compression is None:
+        compression = 'default'
+    if isinstance(compression, str):
+        try:
+            compression = COMPRESSION_PROFILES[compression]
+        except KeyError:
+            raise ValueError(f"Unknown compression profile: {compression}")
+    if not 9 <= compression.get('wbits', zlib.MAX_WBITS) <= 15:
+        raise ValueError(
+            f"wbits must be between 9 and 15: {compression['wbits']}")
+    compressor = zlib.compressobj(**compression)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decode_0(string, json_backend=None):
+    loads, _ = _get_json_backend(json_backend)
+    try:
+        data = zlib.decompress(base64.b64decode(string[1:]))
     except (TypeError, base64.binascii.Error, zlib.error):
         raise InvalidExchangeString(
             "Could not decode exchange string")
-    return data
+    return loads(data)
+
 
+def _encode_0(obj, json_backend=None, compression=None):
+    _, dumps = _get_json_backend(json_backend)
+    return _encode_json_0(dumps(obj), compression)
 
-def _encode_0(obj):
-    temp = bytes(json.dumps(obj), 'UTF-8')
-    temp2 = zlib.compress(temp)
-    temp3 = base64.b64encode(temp2)
-    return '0' + temp3.decode('UTF-8')
 
+def _encode_json_0(data, compression=None):
+    """ Encodes already serialized json into an exchange string """
+    temp = _compress(data, compression)
+    temp2 = base64.b64encode(temp)
+    return '0' + temp2.decode('UTF-8')
 
-def decode(string):
+
+def decode(string, json_backend=None):
     try:
-        return _decode[string[0]](string)
-    except KeyError:
+        decoder = _decode[string[0]]
+    except (KeyError, IndexError, TypeError):
+        raise InvalidExchangeString(
+            "Could not decode exchange string")
+    return decoder(string, json_backend=json_backend)
+
+
+def encode(obj, json_backend=None, compression=None):
+    """ Encodes obj into an exchange string. compression is the name of
+    one of the COMPRESSION_PROFILES or a dict of zlib.compressobj
+    arguments """
+    return _encode['latest'](
+        obj, json_backend=json_backend, compression=compression)
+
+
+def decode_many(strings, workers=None, chunksize=16, json_backend=None):
+    """ Decodes a batch of exchange strings over a pool of worker
+    processes and returns the results in order. A string that can't be
+    decoded gives an InvalidExchangeString in its place instead of
+    failing the batch.
+
+    workers defaults to the number of cpus, workers=1 decodes in the
+    current process. """
+    json_backend = _json_backend_name(json_backend)
+    return _map(
+        functools.partial(_decode_or_error, json_backend=json_backend),
+        strings, workers, chunksize)
+
+
+def encode_many(objs, workers=None, chunksize=16,
+                json_backend=None, compression=None):
+    """ Encodes a batch of json objects over a pool of worker processes
+    and returns the exchange strings in order """
+    json_backend = _json_backend_name(json_backend)
+    return _map(
+        functools.partial(
+            encode, json_backend=json_backend, compression=compression),
+        objs, workers, chunksize)
+
+
+def _decode_or_error(string, json_backend=None):
+    try:
+        return decode(string, json_backend=json_backend)
+    except InvalidExchangeString as e:
+        return e
+    except ValueError as e:
+        return InvalidExchangeString(f"Could not decode exchange string: {e}")
+
+
+def _map(function, items, workers, chunksize):
+    if workers == 1:
+        return [function(item) for item in items]
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(function, items, chunksize=chunksize))
+
+
+def iter_decode(source, chunk_size=1 << 16):
+    """ Decodes an exchange string piece by piece and yields its top level
+    blueprints one at a time.
+
+    source is the exchange string itself or a file object to read it from.
+    For a blueprint book every entry of its blueprints list is yielded
+    (e.g. {"blueprint": {...}, "index": 0}), anything else is yielded as a
+    whole. Only the json of a single entry is held in memory at a time. """
+    scanner = _BookScanner()
+    for chunk in _iter_inflate(source, chunk_size):
+        for offset, raw, child in scanner.feed(chunk):
+            yield child
+    for offset, raw, child in scanner.close():
+        yield child
+    if not scanner.is_book:
+        yield json.loads(scanner.envelope)
+
+
+def _iter_source(source, chunk_size):
+    if isinstance(source, (str, bytes)):
+        for i in range(0, len(source), chunk_size):
+            yield source[i:i + chunk_size]
+        return
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_inflate(source, chunk_size=1 << 16):
+    """ Yields the inflated json of an exchange string in chunks of at most
+    chunk_size bytes """
+    inflater = zlib.decompressobj()
+    pending = ''
+    version = None
+    try:
+        for chunk in _iter_source(source, chunk_size):
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode('ascii')
+            pending += ''.join(chunk.split())
+            if version is None:
+                if not pending:
+                    continue
+                version, pending = pending[0], pending[1:]
+                if version != '0':
+                    raise InvalidExchangeString(
+                        "Could not decode exchange string")
+            usable = len(pending) - len(pending) % 4
+            data = base64.b64decode(pending[:usable], validate=True)
+            pending = pending[usable:]
+            while data:
+                inflated = inflater.decompress(data, chunk_size)
+                data = inflater.unconsumed_tail
+                if inflated:
+                    yield inflated
+        data = base64.b64decode(pending, validate=True)
+        while data:
+            inflated = inflater.decompress(data, chunk_size)
+            data = inflater.unconsumed_tail
+            if inflated:
+                yield inflated
+        inflated = inflater.flush()
+        if inflated:
+            yield inflated
+    except (UnicodeDecodeError, base64.binascii.Error, zlib.error):
+        raise InvalidExchangeString(
+            "Could not decode exchange string")
+    if version is None or not inflater.eof:
         raise InvalidExchangeString(
             "Could not decode exchange string")
 
 
-def encode(obj):
-    return _encode['latest'](obj)
+class _BookScanner:
+    """ Splits the json of a blueprint book into its entries as the data
+    comes in.
+
+    feed() and close() return an (offset, raw json, parsed json) tuple for
+    every entry completed so far, offset being the position of the raw
+    json in the whole json. After close(), envelope holds the json of the
+    book itself with an empty blueprints list, or the whole json if it is
+    not a blueprint book. """
+    BLUEPRINTS = (None, b'blueprint_book', b'blueprints')
+
+    _TOKEN = re.compile(rb'["{}\[\]:,]')
+    _STRING_END = re.compile(rb'["\\]')
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.is_book = False
+        self.envelope = bytearray()
+        self._buffer = bytearray()
+        # Position of the start of the buffer in the whole json.
+        self._offset = 0
+        self._pos = 0
+        # Keys of the containers we are in, None for nameless ones.
+        self._stack = []
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        # Start of the entry being read, and how much of it to buffer
+        # before trying to parse it (again).
+        self._child_start = None
+        self._child_wait = 0
+        # Start of the part of the buffer that still has to be copied to
+        # the envelope, None while inside the blueprints list.
+        self._envelope_start = 0
+
+    def feed(self, data):
+        self._buffer += data
+        children = self._scan()
+        self._trim()
+        return children
+
+    def close(self):
+        self._child_wait = 0
+        children = self._scan(final=True)
+        if self._stack or self._string_start is not None:
+            raise InvalidExchangeString("Truncated blueprint json")
+        self.envelope += self._buffer[self._envelope_start:]
+        self.envelope = bytes(self.envelope)
+        self._buffer = bytearray()
+        return children
+
+    def _parse_child(self, final):
+        """ Returns the end and parsed json of the entry starting at
+        _child_start, or None if it is not complete yet """
+        buffer = self._buffer
+        size = len(buffer) - self._child_start
+        if size < self._child_wait:
+            return None
+        # Entries are parsed whole rather than scanned token by token,
+        # the json module does that a lot faster. Parsing an incomplete
+        # entry fails, in which case wait for the buffer to double, to
+        # keep the number of retries logarithmic.
+        try:
+            text = buffer[self._child_start:].decode('UTF-8')
+            child, end = self._decoder.raw_decode(text)
+        except ValueError:
+            if final:
+                raise InvalidExchangeString("Invalid blueprint json")
+            self._child_wait = 2 * size
+            return None
+        if not text.isascii():
+            end = len(text[:end].encode('UTF-8'))
+        return self._child_start + end, child
+
+    def _scan(self, final=False):
+        buffer = self._buffer
+        stack = self._stack
+        children = []
+        pos = self._pos
+        while True:
+            if self._child_start is not None:
+                parsed = self._parse_child(final)
+                if parsed is None:
+                    pos = len(buffer)
+                    break
+                pos, child = parsed
+                children.append((
+                    self._offset + self._child_start,
+                    bytes(buffer[self._child_start:pos]),
+                    child))
+                self._child_start = None
+                continue
+
+            if self._string_start is not None:
+                match = self._STRING_END.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if buffer[match.start()] == 0x5c:  # backslash
+                    if match.end() >= len(buffer):
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                pos = match.end()
+                self._last_string = bytes(
+                    buffer[self._string_start + 1:match.start()])
+                self._string_start = None
+                continue
+
+            match = self._TOKEN.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            token = buffer[match.start()]
+            pos = match.end()
+            if token == 0x22:  # "
+                self._string_start = match.start()
+            elif token == 0x3a:  # :
+                self._key = self._last_string
+            elif token == 0x2c:  # ,
+                self._key = None
+            elif token == 0x7b and tuple(stack) == self.BLUEPRINTS:  # {
+                self._child_start = match.start()
+                self._child_wait = 0
+            elif token in b'{[':
+                stack.append(self._key)
+                self._key = None
+                if token == 0x5b and tuple(stack) == self.BLUEPRINTS:
+                    self.is_book = True
+                    self.envelope += buffer[self._envelope_start:pos]
+                    self._envelope_start = None
+            else:
+                if not stack:
+                    raise InvalidExchangeString("Invalid blueprint json")
+                stack.pop()
+                self._key = None
+                if self._envelope_start is None and \
+                        tuple(stack) == self.BLUEPRINTS[:-1]:
+                    self._envelope_start = match.start()
+        self._pos = pos
+        return children
+
+    def _trim(self):
+        keep = self._pos
+        for start in (self._child_start, self._string_start):
+            if start is not None and start < keep:
+                keep = start
+        if self._envelope_start is not None:
+            self.envelope += self._buffer[self._envelope_start:keep]
+            self._envelope_start = 0
+        del self._buffer[:keep]
+        self._offset += keep
+        self._pos -= keep
+        if self._child_start is not None:
+            self._child_start -= keep
+        if self._string_start is not None:
+            self._string_start -= keep
 
 
 _decode = {
@@ -111,6 +480,17 @@ class Color:
         return obj
 
 
+FLIP_HORIZONTAL = 'horizontal'
+FLIP_VERTICAL = 'vertical'
+
+
+def _flip_axis(axis):
+    if axis not in (FLIP_HORIZONTAL, FLIP_VERTICAL):
+        raise ValueError(
+            f"axis must be '{FLIP_HORIZONTAL}' or '{FLIP_VERTICAL}': {axis}")
+    return axis
+
+
 class Direction(int):
     CLOCKWISE = 0
     COUNTER_CLOCKWISE = 1
@@ -187,25 +567,16 @@ class Direction(int):
             amount = 8 - amount
         return Direction(self + amount)
 
+    def flip(self, axis):
+        """ Mirrors the direction, 'horizontal' swaps left and right and
+        'vertical' swaps up and down """
+        if _flip_axis(axis) == FLIP_HORIZONTAL:
+            return Direction(-self)
+        return Direction(4 - self)
+
     @property
     def vector(self):
-        if self == 0:
-            return Vector(0, -1)
-        elif self == 1:
-            return Vector(1, -1)
-        elif self == 2:
-            return Vector(1, 0)
-        elif self == 3:
-            return Vector(1, 1)
-        elif self == 4:
-            return Vector(0, 1)
-        elif self == 5:
-            return Vector(-1, 1)
-        elif self == 6:
-            return Vector(-1, 0)
-        elif self == 7:
-            return Vector(-1, -1)
-        return ValueError("Direction outside of 0-7 range")
+        return _vector(*_DIRECTION_VECTORS[self])
 
 
 class Condition:
@@ -355,9 +726,22 @@ class Connection:
             return True
         return False
 
+    def __hash__(self):
+        # Has to agree with __eq__, which ignores the orientation. The
+        # color is left out, flip_color() changes it in place.
+        return hash(frozenset((
+            (self.from_entity, self.from_side),
+            (self.to_entity, self.to_side))))
+
 
 class Vector:
+    __slots__ = ('x', 'y')
+
     def __new__(cls, *args, **kwargs):
+        if len(args) == 2 and not kwargs:
+            self = _new_vector(cls)
+            self.x, self.y = args
+            return self
         if args and kwargs:
             raise TypeError("Vector() can't set both args and kwargs")
         if not args and not kwargs:
@@ -365,27 +749,28 @@ class Vector:
         if args:
             if args[0] is None:
                 return None
-        return super().__new__(cls)
-
-    def __init__(self, *args, **kwargs):
+        self = _new_vector(cls)
         if args:
             if len(args) == 1:
-                if type(args[0]) == dict:
+                if type(args[0]) == Vector:
+                    self.x = args[0].x
+                    self.y = args[0].y
+                elif type(args[0]) == dict:
                     self.x = args[0]["x"]
                     self.y = args[0]["y"]
-                elif type(args[0]) == tuple or \
-                        type(args[0]) == Vector:
+                elif type(args[0]) == tuple:
                     self.x, self.y = args[0]
                 else:
                     raise ValueError(args)
-            elif len(args) == 2:
-                self.x = args[0]
-                self.y = args[1]
             else:
                 raise ValueError(args)
         else:
             self.x = kwargs['x']
             self.y = kwargs['y']
+        return self
+
+    def __reduce__(self):
+        return Vector, (self.x, self.y)
 
     def to_json(self):
         return {
@@ -394,27 +779,27 @@ class Vector:
         }
 
     def __iter__(self):
-        yield from [self.x, self.y]
+        return iter((self.x, self.y))
 
     @property
     def xy(self):
-        return Vector(self.x, self.y)
+        return _vector(self.x, self.y)
 
     @property
     def yx(self):
-        return Vector(self.y, self.x)
+        return _vector(self.y, self.x)
 
     def __repr__(self):
         return f"<Vector ({self.x}, {self.y})>"
 
     def __add__(self, other):
         if type(other) is Vector:
-            return Vector(self.x + other.x, self.y + other.y)
+            return _vector(self.x + other.x, self.y + other.y)
         elif type(other) is int or type(other) is float:
-            return Vector(self.x + other, self.y + other)
+            return _vector(self.x + other, self.y + other)
         elif type(other) is tuple:
             x, y = other
-            return Vector(self.x + x, self.y + y)
+            return _vector(self.x + x, self.y + y)
         return NotImplemented
 
     def __radd__(self, other):
@@ -422,30 +807,30 @@ class Vector:
 
     def __sub__(self, other):
         if type(other) is Vector:
-            return Vector(self.x - other.x, self.y - other.y)
+            return _vector(self.x - other.x, self.y - other.y)
         elif type(other) is int or type(other) is float:
-            return Vector(self.x - other, self.y - other)
+            return _vector(self.x - other, self.y - other)
         elif type(other) is tuple:
             x, y = other
-            return Vector(self.x - x, self.y - y)
+            return _vector(self.x - x, self.y - y)
         return NotImplemented
 
     def __rsub__(self, other):
         if type(other) is int or type(other) is float:
-            return Vector(other - self.x, other - self.y)
+            return _vector(other - self.x, other - self.y)
         elif type(other) is tuple:
             x, y = other
-            return Vector(x - self.x, y - self.y)
+            return _vector(x - self.x, y - self.y)
         return NotImplemented
 
     def __mul__(self, other):
         if type(other) is Vector:
-            return Vector(self.x * other.x, self.y * other.y)
+            return _vector(self.x * other.x, self.y * other.y)
         elif type(other) is int or type(other) is float:
-            return Vector(self.x * other, self.y * other)
+            return _vector(self.x * other, self.y * other)
         elif type(other) is tuple:
             x, y = other
-            return Vector(self.x * x, self.y * y)
+            return _vector(self.x * x, self.y * y)
         return NotImplemented
 
     def __rmul__(self, other):
@@ -453,56 +838,56 @@ class Vector:
 
     def __truediv__(self, other):
         if type(other) is Vector:
-            return Vector(self.x / other.x, self.y / other.y)
+            return _vector(self.x / other.x, self.y / other.y)
         elif type(other) is int or type(other) is float:
-            return Vector(self.x / other, self.y / other)
+            return _vector(self.x / other, self.y / other)
         elif type(other) is tuple:
             x, y = other
-            return Vector(self.x / x, self.y / y)
+            return _vector(self.x / x, self.y / y)
         return NotImplemented
 
     def __rtruediv__(self, other):
         if type(other) is int or type(other) is float:
-            return Vector(other / self.x, other / self.y)
+            return _vector(other / self.x, other / self.y)
         elif type(other) is tuple:
             x, y = other
-            return Vector(x / self.x, y / self.y)
+            return _vector(x / self.x, y / self.y)
         return NotImplemented
 
     def __floordiv__(self, other):
         if type(other) is Vector:
-            return Vector(self.x // other.x, self.y // other.y)
+            return _vector(self.x // other.x, self.y // other.y)
         elif type(other) is int or type(other) is float:
-            return Vector(self.x // other, self.y // other)
+            return _vector(self.x // other, self.y // other)
         elif type(other) is tuple:
             x, y = other
-            return Vector(self.x // x, self.y // y)
+            return _vector(self.x // x, self.y // y)
         return NotImplemented
 
     def __rfloordiv__(self, other):
         if type(other) is int or type(other) is float:
-            return Vector(other // self.x, other // self.y)
+            return _vector(other // self.x, other // self.y)
         elif type(other) is tuple:
             x, y = other
-            return Vector(x // self.x, y // self.y)
+            return _vector(x // self.x, y // self.y)
         return NotImplemented
 
     def __mod__(self, other):
         if type(other) is Vector:
-            return Vector(self.x % other.x, self.y % other.y)
+            return _vector(self.x % other.x, self.y % other.y)
         elif type(other) is int or type(other) is float:
-            return Vector(self.x % other, self.y % other)
+            return _vector(self.x % other, self.y % other)
         elif type(other) is tuple:
             x, y = other
-            return Vector(self.x % x, self.y % y)
+            return _vector(self.x % x, self.y % y)
         return NotImplemented
 
     def __rmod__(self, other):
         if type(other) is int:
-            return Vector(other % self.x, other % self.y)
+            return _vector(other % self.x, other % self.y)
         elif type(other) is tuple:
             x, y = other
-            return Vector(x % self.x, y % self.y)
+            return _vector(x % self.x, y % self.y)
 
     def __eq__(self, other):
         if type(other) is tuple:
@@ -538,27 +923,71 @@ class Vector:
     def ceil(self):
         x = math.ceil(self.x)
         y = math.ceil(self.y)
-        return Vector(x, y)
+        return _vector(x, y)
 
     def floor(self):
         x = math.floor(self.x)
         y = math.floor(self.y)
-        return Vector(x, y)
+        return _vector(x, y)
 
     def round(self):
         x = math.floor(self.x + 0.5)
         y = math.floor(self.y + 0.5)
-        return Vector(x, y)
+        return _vector(x, y)
 
     def copy(self):
-        return Vector(self.x, self.y)
+        return _vector(self.x, self.y)
 
     def rotate(self, amount):
         amount %= 4
-        v = self.copy()
-        for _ in range(amount):
-            v.x, v.y = -v.y, v.x
-        return v
+        if amount == 0:
+            return _vector(self.x, self.y)
+        elif amount == 1:
+            return _vector(-self.y, self.x)
+        elif amount == 2:
+            return _vector(-self.x, -self.y)
+        return _vector(self.y, -self.x)
+
+    def flip(self, axis):
+        """ Mirrors the vector, 'horizontal' negates x and 'vertical'
+        negates y """
+        if _flip_axis(axis) == FLIP_HORIZONTAL:
+            return _vector(-self.x, self.y)
+        return _vector(self.x, -self.y)
+
+
+_new_vector = object.__new__
+
+
+def _vector(x, y):
+    """ Builds a Vector from two numbers, skipping the argument checks """
+    vector = _new_vector(Vector)
+    vector.x = x
+    vector.y = y
+    return vector
+
+
+# Shared instances for values that come up all the time. Vectors can be
+# changed in place, so these are only used internally and never handed
+# out to callers.
+_ZERO = _vector(0, 0)
+_HALF = _vector(0.5, 0.5)
+_DIRECTION_VECTORS = (
+    (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+
+# _TURNED_DIRECTIONS[amount][direction] is direction turned amount clockwise
+# quarter turns.
+_TURNED_DIRECTIONS = tuple(
+    tuple(Direction(direction + 2 * amount) for direction in range(8))
+    for amount in range(4))
+
+
+def _quarter_turns(amount, direction=Direction.CLOCKWISE):
+    """ Returns amount quarter turns in the given direction as a number of
+    clockwise quarter turns between 0 and 3 """
+    if direction not in (Direction.CLOCKWISE, 'clockwise'):
+        amount = -amount
+    return amount % 4
 
 
 class TileName:
@@ -572,15 +1001,15 @@ class TileName:
         self.name = "__" + name
 
     def __set__(self, instance, value):
-        if not getattr(instance, 'strict', True):
-            setattr(instance, self.name, value)
-            return
+        if getattr(instance, 'strict', True):
+            from py_factorio_blueprints.blueprint import Blueprint
 
-        from py_factorio_blueprints.blueprint import Blueprint
-
-        if value not in Blueprint.tile_prototypes:
-            raise UnknownTile(value)
+            if value not in Blueprint.tile_prototypes:
+                raise UnknownTile(value)
         setattr(instance, self.name, value)
+        layer = getattr(instance, '_blueprint_layer', None)
+        if layer is not None:
+            layer._update(instance)
 
     def __get__(self, instance, owner):
         return TileName.NameStr(getattr(instance, self.name, ""))
@@ -588,39 +1017,110 @@ class TileName:
 
 class Tile:
     name = TileName()
+    # The position of a tile is its top left corner. Turned amount
+    # clockwise quarter turns, another corner of the tile becomes its top
+    # left one, _CORNERS[amount] is the offset to it.
+    _CORNERS = ((0, 0), (-1, 0), (-1, -1), (0, -1))
 
     def __init__(self, *args, **kwargs):
+        self._blueprint_layer = kwargs.pop('blueprint_layer', None)
         self.name = kwargs.pop('name')
-        self.position = Vector(kwargs.pop('position'))
+        self.position = kwargs.pop('position')
         super().__init__(*args, **kwargs)
 
+    @property
+    def position(self):
+        return self.__position
+
+    @position.setter
+    def position(self, value):
+        self.__position = Vector(value)
+        if self._blueprint_layer is not None:
+            self._blueprint_layer._update(self)
+
     def to_json(self):
         return {'name': self.name,
                 'position': self.position.to_json()}
 
+    @property
     def top_left(self):
-        return self.position - Vector(0.5, 0.5)
+        return self.position - _HALF
 
+    @property
     def bottom_right(self):
-        return self.position + Vector(0.5, 0.5)
+        return self.position + _HALF
 
     def collides(self, position):
         return self.top_left < position < self.bottom_right
 
-    def rotate(self, amount, around=None, direction='clockwise'):
-        if around is None:
-            around = Vector(0, 0)
-        position = self.position - around
-        amount %= 4
-        if direction != 'clockwise':
-            amount = 4 - amount
+    def _turn(self, position, amount):
+        """ Moves the tile to position without telling the layer """
+        self.__position = position
+
+    def _move(self, position):
+        """ Moves the tile to position without telling the layer """
+        self.__position = position
 
-        def r(v):
-            return Vector(-v.y, v.x)
+    def _mirror(self, position, axis):
+        """ Moves the tile to position without telling the layer """
+        self.__position = position
 
-        for _ in range(amount):
-            position = r(position)
-        self.position = position + around
+    def flip(self, axis, around=None):
+        if around is None:
+            around = _ZERO
+        position = (self.position - around).flip(axis) + around
+        # Mirrored, the tile moves to the corner across the flipped axis,
+        # the same as half a turn does along that axis.
+        dx, dy = self._CORNERS[2]
+        if axis == FLIP_HORIZONTAL:
+            self.position = position + (dx, 0)
+        else:
+            self.position = position + (0, dy)
+
+    def rotate(self, amount, around=None, direction='clockwise'):
+        if around is None:
+            around = _ZERO
+        amount = _quarter_turns(amount, direction)
+        position = (self.position - around).rotate(amount) + around
+        self.position = position + self._CORNERS[amount]
+
+
+# Digits floats are rounded to by _normalize_json, enough for any position
+# or orientation while dropping the noise of float arithmetic.
+_NORMALIZED_DIGITS = 9
+
+
+def _normalize_json(value):
+    """ Returns a copy of a json value with its numbers in a single form:
+    floats are rounded and integral floats become ints, so 1.0 and 1
+    serialize the same """
+    if type(value) is float:
+        value = round(value, _NORMALIZED_DIGITS)
+        if value.is_integer():
+            return int(value)
+        return value
+    if isinstance(value, dict):
+        return {key: _normalize_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_json(item) for item in value]
+    return value
+
+
+def _copy_json(value):
+    """ Returns a deep copy of a json value, quicker than copy.deepcopy
+    as it only has dicts and lists to look out for """
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+def _canonical_dumps(obj):
+    """ Serializes obj with sorted keys, the same for equal values """
+    return json.dumps(
+        obj, sort_keys=True, separators=(',', ':'),
+        ensure_ascii=False).encode('UTF-8')
 
 
 def obj_set(obj, key, value):
@@ -3,7 +3,10 @@ import json
 
 from deepdiff import DeepDiff
 
-from py_factorio_blueprints.util import UnknownEntity, Vector, decode
+from py_factorio_blueprints.columns import numpy
+
+from py_factorio_blueprints.util import (
+    UnknownEntity, Vector, Connection, Direction, decode)
 from py_factorio_blueprints.exceptions import *
 from tests.util import _import
 
@@ -91,6 +94,511 @@ class TestBlueprint(unittest.TestCase):
                         self.assertNotIn(entity, blueprint.entities[(x, y)])
                 i += 1
 
+    def test_lazy_numbering(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        positions = [(2, 1), (0, 1), (1, 0), (0, 0)]
+        entities = [
+            blueprint.entities.make(name='transport-belt', position=pos)
+            for pos in positions]
+        self.assertEqual(
+            [entity._auto_entity_number for entity in entities],
+            [4, 3, 2, 1])
+        self.assertEqual(
+            [tuple(entity.position) for entity in blueprint.entities],
+            [(0, 0), (1, 0), (0, 1), (2, 1)])
+
+        entities[0].position = (-1, -1)
+        self.assertEqual(entities[0]._auto_entity_number, 1)
+        self.assertEqual(entities[3]._auto_entity_number, 2)
+
+    def test_at(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        belt = blueprint.entities.make(
+            name='transport-belt', position=(0.5, 0.5))
+        chest = blueprint.entities.make(
+            name='wooden-chest', position=(20.5, 20.5))
+        self.assertEqual(blueprint.entities.at((0.5, 0.5)), [belt])
+        self.assertEqual(blueprint.entities.at((20.5, 20.5)), [chest])
+        self.assertEqual(blueprint.entities.at((10, 10)), [])
+
+        chest.position = (-20.5, -20.5)
+        self.assertEqual(blueprint.entities.at((20.5, 20.5)), [])
+        self.assertEqual(blueprint.entities.at((-20.5, -20.5)), [chest])
+
+        blueprint.entities.remove(belt)
+        self.assertEqual(blueprint.entities.at((0.5, 0.5)), [])
+
+        blueprint.entities.rotate(2)
+        self.assertEqual(blueprint.entities.at((20.5, 20.5)), [chest])
+
+    def test_rename_non_strict(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Entity = _import(
+            'py_factorio_blueprints.entity', 'Entity')
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        for columnar in (False, True):
+            if columnar and numpy is None:
+                continue
+            blueprint = Blueprint(columnar=columnar)
+            chest = Entity(
+                name='wooden-chest', position=(0.5, 0.5), strict=False)
+            blueprint.entities.add(chest)
+            self.assertEqual(blueprint.maximum_values, (1, 0, 1, 0))
+            self.assertEqual(blueprint.entities.at((-0.8, -0.8)), [])
+
+            chest.name = 'assembling-machine-1'
+            self.assertEqual(blueprint.entities.at((-0.8, -0.8)), [chest])
+            self.assertEqual(blueprint.maximum_values, (2, -1, 2, -1))
+
+    def test_in_area(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        entities = [
+            blueprint.entities.make(
+                name='transport-belt', position=(x + 0.5, y + 0.5))
+            for y in range(20) for x in range(20)]
+        found = blueprint.entities.in_area((2, 3), (12, 5))
+        self.assertEqual(len(found), 20)
+        for entity in entities:
+            inside = 2 < entity.position.x < 12 and \
+                3 < entity.position.y < 5
+            if inside:
+                self.assertIn(entity, found)
+            else:
+                self.assertNotIn(entity, found)
+
+    def test_maximum_values(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        blueprint.entities.make(name='wooden-chest', position=(0.5, 0.5))
+        chest = blueprint.entities.make(
+            name='wooden-chest', position=(4.5, 2.5))
+        self.assertEqual(blueprint.maximum_values, (5, 0, 3, 0))
+        self.assertIs(blueprint.maximum_values, blueprint.maximum_values)
+        self.assertEqual(blueprint.center, (2.5, 1.5))
+
+        chest.position = (8.5, 2.5)
+        self.assertEqual(blueprint.maximum_values, (9, 0, 3, 0))
+        blueprint.entities.remove(chest)
+        self.assertEqual(blueprint.maximum_values, (1, 0, 1, 0))
+        blueprint.entities.make(name='wooden-chest', position=(-3.5, 0.5))
+        self.assertEqual(blueprint.top_left, (-4, 0))
+
+    def test_content_hash(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        a = blueprint.entities.make(name='small-lamp', position=(0.5, 0.5))
+        b = blueprint.entities.make(name='small-lamp', position=(4.5, 0.5))
+        a.connect(b, 1, 1, color='red')
+
+        other = Blueprint()
+        d = other.entities.make(name='small-lamp', position=(4.5, 0.5))
+        c = other.entities.make(name='small-lamp', position=(0.5, 0.5))
+        d.connect(c, 1, 1, color='red')
+
+        self.assertEqual(blueprint.content_hash(), other.content_hash())
+        self.assertEqual(blueprint, other)
+        self.assertEqual(len({blueprint, other}), 1)
+
+        digest = blueprint.content_hash()
+        b.position = (6.5, 0.5)
+        self.assertNotEqual(blueprint.content_hash(), digest)
+        self.assertNotEqual(blueprint, other)
+        b.position = (4.5, 0.5)
+        self.assertEqual(blueprint.content_hash(), digest)
+
+        blueprint.label = 'lamps'
+        self.assertNotEqual(blueprint, other)
+
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            string = f.read()
+        blueprint = Blueprint(string=string)
+        other = Blueprint(string=string)
+        self.assertEqual(blueprint, other)
+        assembler = [
+            entity for entity in blueprint.entities
+            if entity.name == 'assembling-machine-1'][0]
+        assembler.recipe = 'iron-gear-wheel'
+        self.assertNotEqual(blueprint, other)
+        self.assertNotEqual(blueprint.to_string(), other.to_string())
+        assembler.recipe = [
+            entity for entity in other.entities
+            if entity.name == 'assembling-machine-1'][0].recipe
+        self.assertEqual(blueprint, other)
+
+        tile = blueprint.tiles.objs[0]
+        name = tile.name
+        tile.name = 'refined-concrete' if name != 'refined-concrete' \
+            else 'concrete'
+        self.assertNotEqual(blueprint, other)
+        tile.name = name
+        self.assertEqual(blueprint, other)
+
+    def test_flip_color(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        lamps = [
+            blueprint.entities.make(
+                name='small-lamp', position=(x + 0.5, 0.5))
+            for x in range(0, 40, 2)]
+        wires = [
+            lamp.connect(other, 1, 1, color='red')
+            for lamp, other in zip(lamps, lamps[1:])]
+        wires[5].flip_color()
+        blueprint.entities.remove(lamps[5])
+        self.assertEqual(len(blueprint.connections), len(wires) - 2)
+        for connection in blueprint.connections:
+            self.assertFalse(connection.attached_to(lamps[5]))
+        blueprint.to_string()
+
+    def test_canonical_json(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/combinators.blueprint') as f:
+            blueprint = Blueprint(string=f.read())
+
+        other = Blueprint()
+        other.label = blueprint.label
+        other.icons = blueprint.icons
+        other.version = blueprint.version
+        for entity in reversed(blueprint.entities.objs):
+            obj = entity.to_json()
+            del obj['entity_number']
+            obj.pop('connections', None)
+            obj['position'] = Vector(obj['position']) + (0.1 + 0.2 - 0.3)
+            other.entities.make(**obj)
+        for connection in blueprint.connections:
+            other.connections.add(Connection(
+                other.entities.at(connection.to_entity.position)[0],
+                other.entities.at(connection.from_entity.position)[0],
+                connection.to_side, connection.from_side,
+                color=connection.color))
+
+        self.assertNotEqual(other.to_json(), blueprint.to_json())
+        self.assertEqual(
+            other.to_json(canonical=True), blueprint.to_json(canonical=True))
+        self.assertEqual(
+            other.to_string(canonical=True),
+            blueprint.to_string(canonical=True))
+        self.assertEqual(
+            Blueprint(string=blueprint.to_string(canonical=True)),
+            blueprint)
+        with self.assertRaises(ValueError):
+            blueprint.to_string(json_backend='json', canonical=True)
+
+    def test_rotate(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            string = f.read()
+        blueprint = Blueprint(string=string)
+        belt = blueprint.entities.make(
+            name='transport-belt', position=(2.5, 0.5), direction=2)
+        tile = blueprint.tiles.make(name='concrete', position=(2, 0))
+        original = blueprint.to_json(canonical=True)
+        original_string = blueprint.to_string()
+
+        blueprint.rotate(1)
+        self.assertEqual(belt.position, (-0.5, 2.5))
+        self.assertEqual(belt.direction, 4)
+        self.assertEqual(tile.position.to_json(), {'x': -1, 'y': 2})
+        self.assertIsInstance(tile.position.x, int)
+        self.assertEqual(blueprint.entities.objs[0], blueprint.entities.at(
+            blueprint.entities.objs[0].position)[0])
+
+        other = Blueprint(string=string)
+        for entity in other.entities:
+            entity.rotate(1)
+        for other_tile in other.tiles:
+            other_tile.rotate(1)
+        other.entities.make(
+            name='transport-belt', position=(-0.5, 2.5), direction=4)
+        other.tiles.make(name='concrete', position=(-1, 2))
+        self.assertEqual(blueprint, other)
+        self.assertEqual(
+            [t.to_json() for t in blueprint.tiles],
+            [t.to_json() for t in other.tiles])
+
+        blueprint.rotate(1, direction=Direction.COUNTER_CLOCKWISE)
+        self.assertEqual(blueprint.to_string(), original_string)
+        for amount in range(4):
+            blueprint.rotate(amount, around=(3, -2))
+            for other_tile in blueprint.tiles:
+                other_tile.rotate(-amount, around=(3, -2))
+            for entity in blueprint.entities:
+                entity.rotate(-amount, around=(3, -2))
+            self.assertEqual(blueprint.to_string(), original_string)
+        blueprint.rotate(2, around=(0.5, 0.5))
+        blueprint.rotate(6, around=(0.5, 0.5))
+        self.assertEqual(blueprint.to_json(canonical=True), original)
+
+    def test_flip(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            string = f.read()
+        blueprint = Blueprint(string=string)
+        belt = blueprint.entities.make(
+            name='transport-belt', position=(2.5, 0.5), direction=2)
+        splitter = blueprint.entities.make(
+            name='splitter', position=(5, 0.5), direction=0,
+            input_priority='left', output_priority='right')
+        inserter = blueprint.entities.make(
+            name='inserter', position=(7.5, 0.5), direction=2,
+            pickup_position=(1, -0.5), drop_position=(-1, 0.5))
+        rail = blueprint.entities.make(
+            name='curved-rail', position=(10, 10), direction=1)
+        locomotive = blueprint.entities.make(
+            name='locomotive', position=(20, 20), orientation=0.125)
+        tile = blueprint.tiles.make(name='concrete', position=(2, 0))
+        original = blueprint.to_json(canonical=True)
+        original_string = blueprint.to_string()
+
+        blueprint.flip('horizontal')
+        self.assertEqual(belt.position, (-2.5, 0.5))
+        self.assertEqual(belt.direction, 6)
+        self.assertEqual(splitter.direction, 0)
+        self.assertEqual(splitter.input_priority, 'right')
+        self.assertEqual(splitter.output_priority, 'left')
+        self.assertEqual(inserter.direction, 6)
+        self.assertEqual(inserter.pickup_position, (-1, -0.5))
+        self.assertEqual(inserter.drop_position, (1, 0.5))
+        self.assertEqual(rail.direction, 0)
+        self.assertEqual(locomotive.orientation, 0.875)
+        self.assertEqual(tile.position.to_json(), {'x': -3, 'y': 0})
+        self.assertIsInstance(tile.position.x, int)
+        self.assertEqual(blueprint.entities.at((-2.5, 0.5))[0], belt)
+        other = Blueprint(string=blueprint.to_string())
+        for other_tile in other.tiles:
+            other_tile.flip('horizontal')
+        self.assertEqual(
+            [t.to_json() for t in other.tiles],
+            [t.to_json() for t in Blueprint(string=original_string).tiles])
+
+        blueprint.flip('horizontal')
+        self.assertEqual(blueprint.to_string(), original_string)
+        blueprint.flip('vertical', around=(0, 3))
+        blueprint.flip('vertical', around=(0, 3))
+        self.assertEqual(blueprint.to_string(), original_string)
+
+        blueprint.flip('vertical', around=(0.5, 0.5))
+        self.assertEqual(belt.position, (2.5, 0.5))
+        self.assertEqual(belt.direction, 2)
+        self.assertEqual(splitter.direction, 4)
+        self.assertEqual(rail.direction, 4)
+        self.assertEqual(locomotive.orientation, 0.375)
+        self.assertEqual(tile.position, (2, 0))
+        blueprint.flip('vertical', around=(0.5, 0.5))
+        self.assertEqual(blueprint.to_json(canonical=True), original)
+
+        with self.assertRaises(ValueError):
+            blueprint.flip('diagonal')
+
+    def test_translate(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            string = f.read()
+        blueprint = Blueprint(string=string)
+        tile = blueprint.tiles.make(name='concrete', position=(2, 0))
+        entities = list(blueprint.entities)
+        positions = [entity.position for entity in entities]
+        numbers = [entity._auto_entity_number for entity in entities]
+
+        blueprint.translate((3, -2))
+        self.assertEqual(
+            [entity.position for entity in entities],
+            [position + (3, -2) for position in positions])
+        self.assertEqual(
+            [entity._auto_entity_number for entity in entities], numbers)
+        self.assertEqual(tile.position, (5, -2))
+        self.assertEqual(
+            blueprint.entities.at(positions[0] + (3, -2)), [entities[0]])
+
+        other = Blueprint(string=string)
+        for entity in other.entities:
+            entity.position += (3, -2)
+        for other_tile in other.tiles:
+            other_tile.position += (3, -2)
+        other.tiles.make(name='concrete', position=(5, -2))
+        self.assertEqual(blueprint, other)
+
+        blueprint.recenter(around=(3, -2))
+        self.assertEqual(
+            [entity.position for entity in entities], positions)
+        self.assertEqual(tile.position, (2, 0))
+
+        blueprint.recenter()
+        self.assertEqual(blueprint.center.ceil(), (0, 0))
+
+    def test_stamp(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            string = f.read()
+        source = Blueprint(string=string)
+        blueprint = Blueprint()
+        offsets = [(0, 0), (200, 0), (0, 50)]
+        blueprint.stamp(source, offsets)
+        self.assertEqual(
+            len(blueprint.entities), 3 * len(source.entities))
+        self.assertEqual(len(blueprint.tiles), 3 * len(source.tiles))
+        self.assertEqual(
+            len(blueprint.connections), 3 * len(source.connections))
+        self.assertEqual(
+            [entity._auto_entity_number for entity in blueprint.entities],
+            list(range(1, len(blueprint.entities) + 1)))
+
+        for offset in offsets:
+            part = Blueprint()
+            part.label, part.icons = source.label, source.icons
+            part.version = source.version
+            part.stamp(source, [offset])
+            part.translate(Vector(offset) * -1)
+            self.assertEqual(part, source)
+
+        self.assertEqual(
+            Blueprint(string=blueprint.to_string()).to_json(),
+            blueprint.to_json())
+
+    def test_tile_repeat(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Schedule = _import('py_factorio_blueprints.blueprint', 'Schedule')
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        blueprint = Blueprint()
+        blueprint.entities.make(name='wooden-chest', position=(0.5, 0.5))
+        blueprint.entities.make(name='wooden-chest', position=(1.5, 0.5))
+        blueprint.tiles.make(name='concrete', position=(0, 0))
+
+        blueprint.tile_repeat(3, 2)
+        self.assertEqual(len(blueprint.entities), 12)
+        self.assertEqual(len(blueprint.tiles), 6)
+        self.assertEqual(blueprint.maximum_values, (6, 0, 2, 0))
+        self.assertEqual(
+            len(blueprint.entities.at((4.5, 1.5))), 1)
+
+        blueprint.tile_repeat(2, 1, spacing=10)
+        self.assertEqual(len(blueprint.entities), 24)
+        self.assertEqual(blueprint.maximum_values, (16, 0, 2, 0))
+
+        first = blueprint.entities.make(
+            name='locomotive', position=(1, 10), orientation=0)
+        second = blueprint.entities.make(
+            name='locomotive', position=(1, 17), orientation=0)
+        blueprint.schedules.append(Schedule(
+            blueprint, schedule=[{'station': 'a'}], locomotives=[]))
+        blueprint.schedules[0].locomotives = [first, second]
+        blueprint.entities.remove(second)
+        blueprint.tile_repeat(2, 1, spacing=20)
+        self.assertEqual(len(blueprint.schedules), 2)
+        copy = blueprint.schedules[1]
+        self.assertEqual(len(copy.locomotives), 1)
+        self.assertEqual(copy.locomotives[0].position, (21, 10))
+        self.assertEqual(copy.schedule, [{'station': 'a'}])
+        self.assertIsNot(copy.schedule, blueprint.schedules[0].schedule)
+
+        with self.assertRaises(ValueError):
+            blueprint.tile_repeat(0, 1)
+        with self.assertRaises(ValueError):
+            Blueprint().tile_repeat(2, 2)
+
+    def test_tile_repeat_sub_tile_boxes(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        inserter = Blueprint()
+        inserter.entities.make(name='inserter', position=(0.5, 0.5))
+        poles = Blueprint()
+        poles.entities.make(name='small-electric-pole', position=(0.5, 0.5))
+        poles.entities.make(name='small-electric-pole', position=(3.5, 0.5))
+        tiles = Blueprint()
+        tiles.entities.make(name='inserter', position=(0.5, 0.5))
+        tiles.tiles.make(name='concrete', position=(2, 1))
+
+        for blueprint, (width, height) in (
+                (inserter, (1, 1)), (poles, (4, 1)), (tiles, (3, 2))):
+            blueprint.tile_repeat(3, 3)
+            positions = [tuple(entity.position)
+                         for entity in blueprint.entities]
+            self.assertEqual(len(set(positions)), len(positions))
+            positions = [tuple(tile.position) for tile in blueprint.tiles]
+            self.assertEqual(len(set(positions)), len(positions))
+            self.assertIn((0.5 + 2 * width, 0.5 + 2 * height), [
+                tuple(entity.position) for entity in blueprint.entities])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_columns(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            string = f.read()
+        blueprint = Blueprint(string=string)
+        columnar = Blueprint(string=string, columnar=True)
+        self.assertEqual(len(columnar.entities.columns), len(columnar.entities))
+        self.assertEqual(columnar.maximum_values, blueprint.maximum_values)
+        self.assertEqual(columnar.to_string(), blueprint.to_string())
+
+        for bp in (blueprint, columnar):
+            bp.rotate(1)
+            bp.entities.translate((3, -2))
+            bp.rotate(3, around=(1.5, 0.5))
+            bp.flip('vertical', around=(1, 0.5))
+            bp.flip('horizontal')
+            bp.tile_repeat(2, 1)
+        self.assertEqual(columnar.to_string(), blueprint.to_string())
+        self.assertEqual(columnar.maximum_values, blueprint.maximum_values)
+
+        entity = columnar.entities.objs[0]
+        position = entity.position
+        entity.position += (1, 0)
+        self.assertEqual(entity.position, position + (1, 0))
+        columnar.entities.remove(entity)
+        self.assertIsNone(entity._columns)
+        self.assertEqual(entity.position, position + (1, 0))
+        self.assertEqual(len(columnar.entities.columns), len(columnar.entities))
+
+        columnar.entities.use_columns(False)
+        self.assertIsNone(columnar.entities.columns)
+        blueprint.entities.remove(blueprint.entities.objs[0])
+        self.assertEqual(columnar.to_string(), blueprint.to_string())
+
     def test_misc(self):
         Blueprint = _import(
             'py_factorio_blueprints.blueprint', 'Blueprint',
@@ -147,6 +655,83 @@ class TestBlueprintStringImport(unittest.TestCase):
         entity = blueprint.entities[(-1.5, -1)][0]
         self.assertEqual(entity.name, 'decider-combinator')
 
+    def test_get_by_id(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/combinators.blueprint') as f:
+            blueprint = Blueprint(string=f.read())
+
+        for entity in blueprint.entities:
+            self.assertIs(
+                blueprint.get_entity_by_id(entity.entity_number), entity)
+            self.assertIs(
+                blueprint.entities.get_by_auto_id(
+                    entity._auto_entity_number),
+                entity)
+        self.assertIsNone(blueprint.get_entity_by_id(1000))
+        self.assertIsNone(blueprint.entities.get_by_auto_id(1000))
+
+        entity = blueprint.get_entity_by_id(1)
+        blueprint.entities.remove(entity)
+        self.assertIsNone(blueprint.get_entity_by_id(1))
+
+        entity = blueprint.get_entity_by_id(2)
+        entity.entity_number = 100
+        self.assertIs(blueprint.get_entity_by_id(100), entity)
+        self.assertIsNone(blueprint.get_entity_by_id(2))
+
+        other = blueprint.get_entity_by_id(3)
+        entity.entity_number = 3
+        self.assertIs(
+            blueprint.get_entity_by_id(3),
+            min(entity, other, key=lambda e: e._auto_entity_number))
+        blueprint.entities.remove(other)
+        self.assertIs(blueprint.get_entity_by_id(3), entity)
+        blueprint.entities.add(other)
+        blueprint.entities.remove(entity)
+        self.assertIs(blueprint.get_entity_by_id(3), other)
+
+    def test_connections_of_entity(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        with open('blueprint_strings/combinators.blueprint') as f:
+            blueprint = Blueprint(string=f.read())
+
+        for entity in blueprint.entities:
+            expected = [
+                connection for connection in blueprint.connections
+                if connection.attached_to(entity)]
+            self.assertCountEqual(entity.get_connections(), expected)
+
+        entity = blueprint.get_entity_by_id(3)
+        self.assertTrue(entity.get_connections())
+        blueprint.entities.remove(entity)
+        for connection in blueprint.connections:
+            self.assertFalse(connection.attached_to(entity))
+
+    def test_from_strings(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        strings = []
+        for name in ['combinators', '4x4_balancer_yellow_belt']:
+            with open(f'blueprint_strings/{name}.blueprint') as f:
+                strings.append(f.read().strip())
+        strings.insert(1, 'invalid')
+
+        blueprints = Blueprint.from_strings(strings, workers=2)
+        self.assertIsInstance(blueprints[0], Blueprint)
+        self.assertIsInstance(blueprints[1], InvalidExchangeString)
+        self.assertIsInstance(blueprints[2], Blueprint)
+        self.assertEqual(
+            blueprints[2].to_string(),
+            Blueprint(string=strings[2]).to_string())
+
     def test_rail(self):
         Blueprint = _import(
             'py_factorio_blueprints.blueprint', 'Blueprint',
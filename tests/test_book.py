@@ -0,0 +1,187 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from py_factorio_blueprints import util
+from tests.util import _import
+
+
+def _book_string(names):
+    blueprints = []
+    for i, name in enumerate(names):
+        with open(f'blueprint_strings/{name}.blueprint') as f:
+            data = util.decode(f.read().strip())
+        data['blueprint']['label'] = name
+        data['index'] = i
+        blueprints.append(data)
+    return util.encode({'blueprint_book': {
+        'item': 'blueprint-book',
+        'label': 'book',
+        'blueprints': blueprints,
+        'active_index': 0,
+        'version': 1}})
+
+
+class TestBook(unittest.TestCase):
+    def setUp(self):
+        self.Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        self.Blueprint.import_prototype_data(
+            '../py_factorio_blueprints/entity_data.json')
+        self.Book = _import(
+            'py_factorio_blueprints.book', 'Book',
+            clear=True)
+
+    def test_lazy_entries(self):
+        names = ['combinators', '4x4_balancer_yellow_belt', 'tiles']
+        book = self.Book(string=_book_string(names))
+        self.assertEqual(len(book), 3)
+        self.assertEqual(book.label, 'book')
+        self.assertEqual(book.labels, names)
+        self.assertFalse(any(entry.loaded for entry in book.entries))
+
+        blueprint = book.find('tiles')
+        self.assertIsInstance(blueprint, self.Blueprint)
+        self.assertIs(book.get(2), blueprint)
+        self.assertEqual(
+            [entry.loaded for entry in book.entries], [False, False, True])
+        with self.assertRaises(KeyError):
+            book.find('missing')
+        with self.assertRaises(IndexError):
+            book.get(3)
+
+    def test_to_string(self):
+        names = ['combinators', '4x4_balancer_yellow_belt']
+        string = _book_string(names)
+        book = self.Book(string=string)
+        self.assertEqual(book.to_json(), util.decode(string))
+        book[0]
+        self.assertEqual(self.Book(string=book.to_string()).labels, names)
+
+    def test_add(self):
+        book = self.Book()
+        blueprint = self.Blueprint()
+        blueprint.label = 'new'
+        book.add(blueprint)
+        book.add(self.Book(), index=5)
+        book.add(self.Blueprint())
+        self.assertEqual([entry.index for entry in book.entries], [0, 5, 6])
+        self.assertIs(book.find('new'), blueprint)
+
+        book = self.Book(string=book.to_string())
+        self.assertIsInstance(book.get(5), self.Book)
+        with self.assertRaises(TypeError):
+            book.add('blueprint')
+
+    def test_index(self):
+        BookIndex = _import('py_factorio_blueprints.book', 'BookIndex')
+        names = ['combinators', '4x4_balancer_yellow_belt', 'tiles']
+        string = _book_string(names)
+        index = BookIndex.build(string)
+        self.assertEqual(len(index), 3)
+        self.assertEqual([record['label'] for record in index], names)
+        self.assertEqual(
+            [record['entities'] for record in index],
+            [len(self.Book(string=string)[i].entities) for i in range(3)])
+
+        book = self.Book.from_index(string, index)
+        self.assertEqual(book.label, 'book')
+        self.assertEqual(book.labels, names)
+        self.assertEqual(book.to_json(), util.decode(string))
+        blueprint = book.find('tiles')
+        self.assertEqual(len(blueprint.tiles), index.records[2]['tiles'])
+
+        with self.assertRaises(ValueError):
+            with open('blueprint_strings/tiles.blueprint') as f:
+                BookIndex.build(f.read())
+
+    def test_index_memory(self):
+        BookIndex = _import('py_factorio_blueprints.book', 'BookIndex')
+        string = _book_string(['entities_test'] * 40)
+        peaks = []
+        for function in (util.decode, BookIndex.build):
+            tracemalloc.start()
+            try:
+                function(string)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        # Only the entry being scanned is held, not the whole book.
+        self.assertLess(peaks[1], peaks[0] / 4)
+
+    def test_inflated_string(self):
+        InflatedString = _import(
+            'py_factorio_blueprints.book', '_InflatedString')
+        BookIndex = _import('py_factorio_blueprints.book', 'BookIndex')
+        string = _book_string(['entities_test'] * 40)
+        raw = b''.join(util._iter_inflate(string))
+        records = BookIndex.build(string).records
+        source = InflatedString(string)
+        # Out of order reads inflate the string again.
+        for record in records[::-1][:2] + records[:2]:
+            start = record['offset']
+            end = start + record['length']
+            self.assertEqual(source.read(start, end), raw[start:end])
+
+        source = InflatedString(string)
+        tracemalloc.start()
+        try:
+            for record in records:
+                start = record['offset']
+                source.read(start, start + record['length'])
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # Entries already read are not kept.
+        self.assertLess(peak, len(raw) / 4)
+
+    def test_open(self):
+        BookIndex = _import('py_factorio_blueprints.book', 'BookIndex')
+        string = _book_string(['combinators', 'tiles'])
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'book.txt')
+            with open(filename, 'w') as f:
+                f.write(string)
+            book = self.Book.open(filename)
+            self.assertEqual(book.labels, ['combinators', 'tiles'])
+            index = BookIndex.load(filename + '.index', string)
+            self.assertEqual(index.records, BookIndex.build(string).records)
+
+            other = _book_string(['tiles'])
+            self.assertIsNone(BookIndex.load(filename + '.index', other))
+            with open(filename, 'w') as f:
+                f.write(other)
+            self.assertEqual(self.Book.open(filename).labels, ['tiles'])
+
+    def test_dirty_entries(self):
+        names = ['combinators', '4x4_balancer_yellow_belt', 'tiles']
+        string = _book_string(names)
+        book = self.Book(string=string)
+        self.assertFalse(any(entry.dirty for entry in book.entries))
+        self.assertEqual(book.to_string(), string)
+
+        book.find('tiles').label = 'changed'
+        book.entries[0].index = 7
+        self.assertEqual(
+            [entry.dirty for entry in book.entries], [True, False, True])
+        book.entries[1].mark_dirty()
+        self.assertTrue(book.entries[1].dirty)
+
+        self.assertEqual(
+            util.decode(book.to_string()),
+            util.decode(util.encode(book.to_json())))
+        self.assertEqual(
+            self.Book(string=book.to_string()).labels,
+            ['combinators', '4x4_balancer_yellow_belt', 'changed'])
+
+    def test_dirty_indexed_entries(self):
+        string = _book_string(['combinators', 'tiles'])
+        book = self.Book.from_index(string)
+        self.assertEqual(util.decode(book.to_string()), util.decode(string))
+        book.label = 'other'
+        book.get(1).label = 'changed'
+        result = self.Book(string=book.to_string())
+        self.assertEqual(result.label, 'other')
+        self.assertEqual(result.labels, ['combinators', 'changed'])
@@ -59,3 +59,40 @@ class TestEntity(unittest.TestCase):
         entity = Entity(name='underground-belt', position=(0, 0), type='input')
         self.assertEqual(entity.name, 'underground-belt')
         self.assertEqual(entity.type, 'input')
+
+    def test_shared_mixin_class(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        belt1 = Entity(name='transport-belt', position=(0, 0))
+        belt2 = Entity(name='transport-belt', position=(1, 0))
+        inserter = Entity(name='inserter', position=(2, 0))
+        self.assertIs(type(belt1), type(belt2))
+        self.assertIsNot(type(belt1), type(inserter))
+        self.assertIs(type(belt1).ControlBehavior,
+                      type(belt2).ControlBehavior)
+
+    def test_selection_box(self):
+        Blueprint = _import(
+            'py_factorio_blueprints.blueprint', 'Blueprint',
+            clear=True)
+        Blueprint.import_prototype_data('../py_factorio_blueprints/entity_data.json')
+        splitter = Entity(name='splitter', position=(0, 0.5))
+        top_left, bottom_right = splitter.selection_box
+        self.assertEqual(top_left, (-0.8984375, -0.5))
+        self.assertEqual(bottom_right, (0.8984375, 0.5))
+        splitter.selection_box[0].x = 100
+        self.assertEqual(
+            Entity(name='splitter', position=(5, 5)).selection_box[0],
+            (-0.8984375, -0.5))
+        self.assertTrue(splitter.collides((0.8, 0.5)))
+        self.assertFalse(splitter.collides((0, 1.2)))
+
+        splitter.direction = 2
+        top_left, bottom_right = splitter.selection_box
+        self.assertEqual(top_left, (-0.5, -0.8984375))
+        self.assertEqual(bottom_right, (0.5, 0.8984375))
+        self.assertFalse(splitter.collides((0.8, 0.5)))
+        self.assertTrue(splitter.collides((0, 1.2)))
+        self.assertEqual(splitter.collision_box, splitter.selection_box)
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from py_factorio_blueprints import prototype_data
+
+
+class TestPrototypeDataCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'entity_data.json')
+        shutil.copy(
+            '../py_factorio_blueprints/entity_data.json', self.filename)
+        self.cache = prototype_data.cache_filename(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_creates_cache(self):
+        self.assertFalse(os.path.exists(self.cache))
+        data = prototype_data.load(self.filename)
+        self.assertTrue(os.path.exists(self.cache))
+        self.assertEqual(data, prototype_data.load(self.filename))
+        with open(self.filename) as f:
+            self.assertEqual(data, json.load(f))
+
+    def test_no_cache(self):
+        prototype_data.load(self.filename, cache=False)
+        self.assertFalse(os.path.exists(self.cache))
+
+    def test_touched_source(self):
+        data = prototype_data.load(self.filename)
+        os.utime(self.filename, ns=(0, 0))
+        self.assertEqual(data, prototype_data.load(self.filename))
+
+    def test_changed_source(self):
+        prototype_data.load(self.filename)
+        with open(self.filename, 'w') as f:
+            json.dump({'entity': {}}, f)
+        self.assertEqual(
+            prototype_data.load(self.filename), {'entity': {}})
+
+    def test_corrupt_cache(self):
+        data = prototype_data.load(self.filename)
+        with open(self.cache, 'wb') as f:
+            f.write(b'garbage')
+        self.assertEqual(data, prototype_data.load(self.filename))
+
+    def test_lazy_tables(self):
+        data = prototype_data.load(self.filename, cache=False)
+        cached = prototype_data.load(self.filename)
+        self.assertIs(type(cached['entity']), dict)
+
+        cached = prototype_data.load(self.filename)
+        entities = cached['entity']
+        self.assertIsInstance(entities, prototype_data.PrototypeTable)
+        self.assertIn('transport-belt', entities)
+        self.assertNotIn('not-an-entity', entities)
+        with self.assertRaises(KeyError):
+            entities['not-an-entity']
+        self.assertEqual(
+            entities['transport-belt'], data['entity']['transport-belt'])
+        self.assertIs(
+            entities['transport-belt'], entities['transport-belt'])
+        self.assertEqual(len(entities), len(data['entity']))
+        self.assertEqual(list(entities), list(data['entity']))
+        self.assertEqual(
+            {**entities, 'extra': {}}, {**data['entity'], 'extra': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,181 @@
+import io
+import pickle
 import unittest
+import zlib
 
+from py_factorio_blueprints import util
 from py_factorio_blueprints.util import (
-    Color, Direction, Vector
+    Color, Connection, Direction, Vector
 )
+from py_factorio_blueprints.exceptions import InvalidExchangeString
+
+
+class TestJSONBackends(unittest.TestCase):
+    def setUp(self):
+        with open('blueprint_strings/combinators.blueprint') as f:
+            self.string = f.read().strip()
+        self.data = util.decode(self.string, json_backend='json')
+
+    def test_backends(self):
+        self.assertIn('json', util.json_backends())
+        strings = set()
+        for backend in util.json_backends():
+            self.assertEqual(
+                util.decode(self.string, json_backend=backend), self.data)
+            string = util.encode(self.data, json_backend=backend)
+            self.assertEqual(util.decode(string), self.data)
+            strings.add(string)
+        self.assertEqual(len(strings), 1)
+
+        # Output may differ between backends for values like these, so
+        # it does not depend on which packages are installed by default.
+        data = {'values': [0.00001, 1e16, 1e-7, 0.5, -6, 2 ** 70]}
+        self.assertEqual(util._json_backend, 'json')
+        self.assertEqual(
+            util.encode(data), util.encode(data, json_backend='json'))
+        self.assertEqual(util.decode(util.encode(data)), data)
+        for backend in util.json_backends():
+            obj = {'values': data['values'][:-1]}
+            self.assertEqual(
+                util.decode(util.encode(obj, json_backend=backend)), obj)
+
+    def test_non_str_keys(self):
+        obj = {'connections': {1: {'red': [{'entity_id': Direction(2)}]}}}
+        for backend in util.json_backends():
+            self.assertEqual(
+                util.decode(util.encode(obj, json_backend=backend)),
+                {'connections': {'1': {'red': [{'entity_id': 2}]}}})
+
+    def test_set_backend(self):
+        default = util._json_backend
+        try:
+            util.set_json_backend('json')
+            self.assertEqual(util.decode(self.string), self.data)
+            with self.assertRaises(ValueError):
+                util.set_json_backend('not-a-backend')
+        finally:
+            util.set_json_backend(default)
+        with self.assertRaises(ValueError):
+            util.decode(self.string, json_backend='not-a-backend')
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        with open('blueprint_strings/entities_test.blueprint') as f:
+            self.data = util.decode(f.read().strip())
+
+    def test_profiles(self):
+        lengths = {}
+        for profile in util.COMPRESSION_PROFILES:
+            string = util.encode(self.data, compression=profile)
+            self.assertEqual(util.decode(string), self.data)
+            lengths[profile] = len(string)
+        self.assertLessEqual(lengths['smallest'], lengths['default'])
+        self.assertLessEqual(lengths['default'], lengths['fastest'])
+
+    def test_default(self):
+        self.assertEqual(
+            util.encode(self.data),
+            util.encode(self.data, compression='default'))
+        data = util._get_json_backend()[1](self.data)
+        self.assertEqual(util._compress(data), zlib.compress(data))
+
+    def test_custom(self):
+        compression = {
+            'level': 6, 'wbits': 10, 'strategy': zlib.Z_FILTERED}
+        string = util.encode(self.data, compression=compression)
+        self.assertEqual(util.decode(string), self.data)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            util.encode(self.data, compression='not-a-profile')
+        with self.assertRaises(ValueError):
+            util.encode(self.data, compression={'wbits': -15})
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.strings = []
+        for name in ['combinators', 'tiles', 'wire_connections']:
+            with open(f'blueprint_strings/{name}.blueprint') as f:
+                self.strings.append(f.read().strip())
+
+    def test_decode_many(self):
+        strings = [*self.strings, 'not a blueprint', '0eNo=', *self.strings]
+        expected = [util.decode(string) for string in self.strings]
+        for workers in [1, 2]:
+            results = util.decode_many(strings, workers=workers, chunksize=2)
+            self.assertEqual(len(results), len(strings))
+            self.assertEqual(results[:3], expected)
+            self.assertIsInstance(results[3], InvalidExchangeString)
+            self.assertIsInstance(results[4], InvalidExchangeString)
+            self.assertEqual(results[5:], expected)
+
+    def test_encode_many(self):
+        data = [util.decode(string) for string in self.strings]
+        for workers in [1, 2]:
+            strings = util.encode_many(data, workers=workers)
+            self.assertEqual(strings, [util.encode(obj) for obj in data])
+
+    def test_backend(self):
+        with self.assertRaises(ValueError):
+            util.decode_many(self.strings, workers=1, json_backend='nope')
+        with self.assertRaises(ValueError):
+            util.encode_many([{}], workers=1, json_backend='nope')
+        backend = util._json_backend
+        util.set_json_backend('json')
+        try:
+            self.assertEqual(
+                util.decode_many(self.strings, workers=2),
+                [util.decode(string) for string in self.strings])
+        finally:
+            util.set_json_backend(backend)
+
+
+class TestIterDecode(unittest.TestCase):
+    def setUp(self):
+        self.blueprints = []
+        for name in ['combinators', 'tiles', 'wire_connections']:
+            with open(f'blueprint_strings/{name}.blueprint') as f:
+                self.blueprints.append(util.decode(f.read().strip()))
+        self.blueprints[0]['blueprint']['label'] = 'a "label" ] { \\ é'
+        entries = [
+            {**blueprint, 'index': i}
+            for i, blueprint in enumerate(self.blueprints)]
+        entries.append({
+            'blueprint_book': {
+                'item': 'blueprint-book',
+                'blueprints': [{**self.blueprints[1], 'index': 0}],
+                'active_index': 0},
+            'index': len(entries)})
+        self.book = {
+            'blueprint_book': {
+                'item': 'blueprint-book',
+                'label': 'book [1]',
+                'blueprints': entries,
+                'active_index': 1,
+                'version': 1}}
+        self.string = util.encode(self.book)
+
+    def test_book(self):
+        for chunk_size in [1, 5, 100, 1 << 16]:
+            self.assertEqual(
+                list(util.iter_decode(self.string, chunk_size=chunk_size)),
+                self.book['blueprint_book']['blueprints'])
+
+    def test_file(self):
+        entries = list(util.iter_decode(io.StringIO(self.string + '\n')))
+        self.assertEqual(entries, self.book['blueprint_book']['blueprints'])
+
+    def test_blueprint(self):
+        string = util.encode(self.blueprints[0])
+        self.assertEqual(
+            list(util.iter_decode(string)), [self.blueprints[0]])
+
+    def test_invalid(self):
+        for string in ['', '1abc', '0abc', self.string[:-20]]:
+            with self.assertRaises(InvalidExchangeString):
+                list(util.iter_decode(string))
 
 
 class TestColor(unittest.TestCase):
@@ -105,6 +278,15 @@ class TestDirection(unittest.TestCase):
         direction = direction.rotate45(2)
         self.assertTrue(direction.is_up)
 
+    def test_flip(self):
+        self.assertTrue(Direction.right().flip('horizontal').is_left)
+        self.assertTrue(Direction.up().flip('horizontal').is_up)
+        self.assertTrue(Direction.up().flip('vertical').is_down)
+        self.assertEqual(Direction(1).flip('horizontal'), 7)
+        self.assertEqual(Direction(1).flip('vertical'), 3)
+        with self.assertRaises(ValueError):
+            Direction.up().flip('sideways')
+
 
 class TestVector(unittest.TestCase):
     def test_new(self):
@@ -233,6 +415,61 @@ class TestVector(unittest.TestCase):
         vec = Vector(1, 2)
         self.assertEqual(vec.rotate(1), Vector(-2, 1))
         self.assertEqual(vec.rotate(-1), Vector(2, -1))
+        self.assertEqual(vec.rotate(2), Vector(-1, -2))
+        self.assertEqual(vec.rotate(4), vec)
+        self.assertIsNot(vec.rotate(4), vec)
+
+    def test_flip(self):
+        vec = Vector(1, 2)
+        self.assertEqual(vec.flip('horizontal'), Vector(-1, 2))
+        self.assertEqual(vec.flip('vertical'), Vector(1, -2))
+
+    def test_slots(self):
+        vec = Vector(1, 2)
+        self.assertFalse(hasattr(vec, '__dict__'))
+        with self.assertRaises(AttributeError):
+            vec.z = 3
+
+    def test_pickle(self):
+        vec = Vector(1.5, -2)
+        self.assertEqual(pickle.loads(pickle.dumps(vec)), vec)
+
+    def test_direction_vector(self):
+        self.assertEqual(Direction.up().vector, Vector(0, -1))
+        self.assertEqual(Direction.left().vector, Vector(-1, 0))
+        vector = Direction(2).vector
+        vector.x = 99
+        self.assertEqual(Direction(2).vector, Vector(1, 0))
+
+
+class TestConnection(unittest.TestCase):
+    def test_hash(self):
+        a, b = object(), object()
+        conn = Connection(a, b, 1, 2, color='red')
+        flipped = Connection(b, a, 2, 1, color='red')
+        self.assertEqual(conn, flipped)
+        self.assertEqual(hash(conn), hash(flipped))
+        self.assertEqual(len({conn, flipped}), 1)
+
+        self.assertNotEqual(conn, Connection(a, b, 1, 2, color='green'))
+        self.assertNotIn(Connection(a, b, 2, 1, color='red'), {conn})
+
+    def test_hash_after_flip(self):
+        a, b = object(), object()
+        conn = Connection(a, b, 1, 2)
+        connections = {conn}
+        conn.flip()
+        self.assertIn(conn, connections)
+        self.assertIn(Connection(a, b, 1, 2), connections)
+
+    def test_hash_after_flip_color(self):
+        a, b = object(), object()
+        conn = Connection(a, b, 1, 2, color='red')
+        connections = {conn}
+        conn.flip_color()
+        self.assertIn(conn, connections)
+        self.assertIn(Connection(b, a, 2, 1, color='green'), connections)
+        self.assertNotIn(Connection(a, b, 1, 2, color='red'), connections)
 
 
 if __name__ == '__main__':